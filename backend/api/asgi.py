@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
 
 application = get_asgi_application()
+
+# each worker loads its own thread index, a no-op unless THREAD_INDEX_ENABLED
+from api import thread_index  # noqa: E402
+
+thread_index.start()
@@ -0,0 +1,111 @@
+"""
+Continuous ingestion for `import_comments --follow`.
+
+Follows one ndjson file, or every *.ndjson file in a directory, and ingests complete lines as they
+are appended.  The byte offset reached in each file is stored in ImportCheckpoint inside the same
+transaction as the comments, so a restart picks up exactly where the last committed batch ended.
+
+A file replaced under the same name (logrotate style) is spotted by its inode, the rest of the old
+file is read from wherever it was moved to in the same directory, then the new file starts at 0.
+A file that shrank was truncated in place and is read again from the top, upserts on external_id
+keep that idempotent.
+"""
+import json
+import logging
+import time
+from pathlib import Path
+
+from django.db import transaction
+
+from api import comment_manager
+from api.models import ImportCheckpoint
+
+
+def follow_comments(path: Path, batch_size=500, poll_interval=1.0):
+    path = Path(path)
+    logging.info(f"Following {path}")
+    while True:
+        ingested = sum(ingest_appended(comment_file, batch_size) for comment_file in followed_files(path))
+        if not ingested:
+            time.sleep(poll_interval)
+
+
+def followed_files(path: Path) -> list:
+    if path.is_dir():
+        return sorted(path.glob("*.ndjson"))
+    return [path] if path.exists() else []
+
+
+def ingest_appended(comment_file: Path, batch_size=500, on_batch=None) -> int:
+    """
+    Ingests whatever was appended to comment_file since its checkpoint, returns the number of comments.
+    on_batch(comment_count, offset, errors) runs inside each batch's transaction.
+    """
+    comment_file = Path(comment_file).absolute()
+    inode = comment_file.stat().st_ino
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(path=str(comment_file), defaults={"inode": inode})
+
+    ingested = 0
+    if checkpoint.inode != inode:
+        rotated_file = _find_by_inode(comment_file.parent, checkpoint.inode)
+        if rotated_file:
+            logging.info(f"{comment_file} was rotated, finishing {rotated_file} first")
+            ingested += _ingest_from_checkpoint(rotated_file, checkpoint, batch_size, on_batch)
+        checkpoint.inode = inode
+        checkpoint.offset = 0
+        checkpoint.save()
+    elif comment_file.stat().st_size < checkpoint.offset:
+        logging.warning(f"{comment_file} was truncated, reading it again from the start")
+        checkpoint.offset = 0
+        checkpoint.save()
+
+    ingested += _ingest_from_checkpoint(comment_file, checkpoint, batch_size, on_batch)
+    return ingested
+
+
+def _ingest_from_checkpoint(comment_file: Path, checkpoint: ImportCheckpoint, batch_size, on_batch=None) -> int:
+    ingested = 0
+    with open(comment_file, "rb") as f:
+        f.seek(checkpoint.offset)
+        at_end = False
+        while not at_end:
+            comment_datas = []
+            errors = []
+            offset = checkpoint.offset
+            while len(comment_datas) < batch_size:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    # end of file, or a line the writer hasn't finished yet
+                    at_end = True
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    comment_datas.append(json.loads(line))
+                except ValueError:
+                    errors.append(f"malformed line ending at byte {offset} of {comment_file.name}")
+                    logging.warning(f"Skipping malformed line ending at byte {offset} of {comment_file}")
+
+            if offset == checkpoint.offset:
+                break
+
+            with transaction.atomic():
+                if comment_datas:
+                    comment_manager.ingest_comments(comment_datas)
+                checkpoint.offset = offset
+                checkpoint.save()
+                if on_batch:
+                    on_batch(len(comment_datas), offset, errors)
+            ingested += len(comment_datas)
+
+    if ingested:
+        logging.info(f"Ingested {ingested} comments from {comment_file}")
+    return ingested
+
+
+def _find_by_inode(directory: Path, inode):
+    for candidate in directory.iterdir():
+        if candidate.is_file() and candidate.stat().st_ino == inode:
+            return candidate
+    return None
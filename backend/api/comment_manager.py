@@ -1,10 +1,39 @@
+import datetime
+import gzip
 import json
 import logging
 from pathlib import Path
 
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from api.models import Comment, Person
+from api import comment_partitions
+from api.models import AuthorStats, Comment, PendingParentLink, Person
+
+EXPORT_FORMATS = ("json", "ndjson")
+
+# ids of every reply under a soft-deleted comment the purge hasn't marked yet, starts from the
+# handful of deleted rows in comment_pending_purge_idx and walks down the parent fk index
+HIDDEN_REPLIES_SQL = f"""
+    WITH RECURSIVE hidden (id) AS (
+        SELECT id FROM {Comment._meta.db_table} WHERE deleted_date IS NOT NULL
+        UNION
+        SELECT reply.id FROM {Comment._meta.db_table} AS reply JOIN hidden ON reply.parent_comment_id = hidden.id
+    )
+    SELECT id FROM hidden
+"""
+
+HOT_SCORE_GRAVITY = 1.5
+
+# past this age a comment's score stops decaying, it stays at its value at the horizon (so likes
+# still rank old comments against each other) and the decay job stops visiting it
+HOT_SCORE_HORIZON = datetime.timedelta(days=7)
+# how far past the horizon the decay job still looks, it has to run at least this often to freeze every score
+HOT_SCORE_FREEZE_GRACE = datetime.timedelta(days=1)
 
 
 def import_comments(comment_file: Path, reset=False):
@@ -14,14 +43,25 @@ def import_comments(comment_file: Path, reset=False):
     
     if reset:
         logging.info(f"Deleting all existing comments")
-        Comment.objects.all().delete()
+        Comment.all_objects.all().delete()
+        AuthorStats.objects.all().delete()
+        PendingParentLink.objects.all().delete()
     
-    comment_file_contents = json.loads(comment_file.read_text())
-    comment_datas = comment_file_contents.get("comments")
+    comment_datas = read_comment_file(comment_file)
     if not comment_datas:
         raise ValueError(f"no comments found in {comment_file}")
     
     logging.info(f"Ingesting {len(comment_datas)} from {comment_file}")
+    ingest_comments(comment_datas)
+    logging.info(f"Have {Comment.objects.count()} after ingesting {comment_file}")
+
+
+def ingest_comments(comment_datas: list):
+    """
+    Upserts a batch of comments in the import schema.  The work is proportional to the batch, so
+    it also serves the micro-batches from import_comments --follow.  A reply whose parent is not in
+    the db yet is stored as a top level comment and linked once a later batch brings the parent.
+    """
     authors = {
         comment_data.get("author")
         for comment_data in comment_datas
@@ -35,6 +75,23 @@ def import_comments(comment_file: Path, reset=False):
         )
         author_id_map[p.name] = p.id
     
+    comment_partitions.ensure_partitions_for_dates([
+        parse_datetime(comment_data.get("date"))
+        for comment_data in comment_datas
+        if comment_data.get("date")
+    ])
+    
+    # what the batch's rows counted for in AuthorStats before this upsert
+    previously_visible = {
+        external_id: (author_id, likes)
+        for external_id, author_id, likes in (
+            Comment.objects
+            .filter(external_id__in={comment_data.get("id") for comment_data in comment_datas})
+            .values_list("external_id", "author_id", "likes")
+        )
+    }
+    
+    comments_by_external_id = {}
     for comment_data in sorted(comment_datas, key=lambda c: c.get("id")):
         d = {
                 "author_id": author_id_map.get(comment_data.get("author")),
@@ -45,13 +102,458 @@ def import_comments(comment_file: Path, reset=False):
                 "image": comment_data.get("image")
             }
         
-        if comment_data.get("parent"):
-            d["parent_comment_id"] = comment_data.get("parent")
-            
-        Comment.objects.update_or_create(
-            id=comment_data.get("id"),
+        comment, _ = Comment.all_objects.update_or_create(
+            external_id=comment_data.get("id"),
             defaults=d
         )
-    logging.info(f"Have {Comment.objects.count()} after ingesting {comment_file}")
+        comments_by_external_id[comment.external_id] = comment
+    
+    # parents can come later in the file than their replies, so link them once every row has a pk
+    parent_ids = {
+        comment_data.get("parent")
+        for comment_data in comment_datas
+        if comment_data.get("parent")
+    }
+    parent_pks = dict(
+        Comment.all_objects.filter(external_id__in=parent_ids).values_list("external_id", "id")
+    )
+    
+    replies = []
+    waiting = []
+    for comment_data in comment_datas:
+        if comment_data.get("parent"):
+            comment = comments_by_external_id[comment_data.get("id")]
+            comment.parent_comment_id = parent_pks.get(comment_data.get("parent"))
+            replies.append(comment)
+            if comment.parent_comment_id is None:
+                waiting.append(
+                    PendingParentLink(external_id=comment.external_id, parent_external_id=comment_data.get("parent"))
+                )
+    
+    # replies from earlier batches that were waiting on a comment of this one
+    arrived = [
+        link for link in PendingParentLink.objects.filter(parent_external_id__in=list(comments_by_external_id))
+        if link.external_id not in comments_by_external_id
+    ]
+    waiting_pks = dict(
+        Comment.all_objects.filter(external_id__in=[link.external_id for link in arrived]).values_list("external_id", "id")
+    )
+    for link in arrived:
+        if link.external_id in waiting_pks:
+            parent = comments_by_external_id[link.parent_external_id]
+            replies.append(Comment(id=waiting_pks[link.external_id], parent_comment_id=parent.id))
+            parent_pks[parent.external_id] = parent.id
+    Comment.all_objects.bulk_update(replies, ["parent_comment"], batch_size=500)
+    
+    PendingParentLink.objects.filter(
+        external_id__in=list(comments_by_external_id) + [link.external_id for link in arrived]
+    ).delete()
+    PendingParentLink.objects.bulk_create(waiting, batch_size=500)
+    
+    reply_counts = dict(
+        Comment.objects
+        .filter(parent_comment_id__in=parent_pks.values())
+        .order_by()
+        .values("parent_comment_id")
+        .annotate(n=Count("id"))
+        .values_list("parent_comment_id", "n")
+    )
+    Comment.all_objects.bulk_update(
+        [Comment(id=parent_pk, reply_count=reply_counts.get(parent_pk, 0)) for parent_pk in parent_pks.values()],
+        ["reply_count"],
+        batch_size=500
+    )
+    refresh_hot_scores(
+        [comment.id for comment in comments_by_external_id.values()] + list(parent_pks.values())
+    )
+    _apply_import_to_author_stats(previously_visible, comments_by_external_id.values())
+
+
+def _apply_import_to_author_stats(previously_visible: dict, comments):
+    """
+    Moves AuthorStats by what an ingested batch changed, the rows' old authors and likes come off
+    and their new ones go on, so the cost doesn't grow with each author's history
+    """
+    deltas = {}
+    for author_id, likes in previously_visible.values():
+        comment_count, total_likes, activity_date = deltas.get(author_id, (0, 0, None))
+        deltas[author_id] = (comment_count - 1, total_likes - (likes or 0), activity_date)
+    
+    for comment in comments:
+        if comment.deleted_date:
+            continue
+        created_date = comment.created_date
+        if isinstance(created_date, str):
+            created_date = parse_datetime(created_date)
+        comment_count, total_likes, activity_date = deltas.get(comment.author_id, (0, 0, None))
+        if created_date and (activity_date is None or created_date > activity_date):
+            activity_date = created_date
+        deltas[comment.author_id] = (comment_count + 1, total_likes + (comment.likes or 0), activity_date)
+    
+    for author_id, (comment_count, total_likes, activity_date) in deltas.items():
+        record_author_activity(author_id, comments=comment_count, likes=total_likes, activity_date=activity_date)
+
+
+def read_comment_file(comment_file: Path) -> list:
+    """Reads the {"comments": [...]} json format or ndjson (one comment per line), either optionally gzipped"""
+    opener = gzip.open if comment_file.suffix == ".gz" else open
+    with opener(comment_file, "rt", encoding="utf-8") as f:
+        if ".ndjson" in comment_file.suffixes:
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f).get("comments")
+
+
+def export_comments(out_file: Path, fmt="json", since=None, until=None, chunk_size=2000) -> int:
+    """
+    Writes visible comments created in [since, until) in the import schema, as json or ndjson and
+    gzipped when out_file ends in .gz.  Rows are streamed from a server side cursor, so memory stays
+    flat however big the table is.  Returns the number of comments written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    
+    out_file = Path(out_file)
+    # replies under a deleted comment aren't visible either, re-importing them would turn them into roots
+    comments = Comment.objects.order_by("created_date", "id").exclude(id__in=RawSQL(HIDDEN_REPLIES_SQL, []))
+    if since:
+        comments = comments.filter(created_date__gte=since)
+    if until:
+        comments = comments.filter(created_date__lt=until)
+    rows = comments.values_list(
+        "external_id", "parent_comment__external_id", "author__name", "text", "created_date", "likes", "image"
+    )
+    
+    count = 0
+    opener = gzip.open if out_file.suffix == ".gz" else open
+    with opener(out_file, "wt", encoding="utf-8") as f:
+        if fmt == "json":
+            f.write('{\n    "comments": [\n')
+        
+        for external_id, parent_id, author, text, created_date, likes, image in rows.iterator(chunk_size=chunk_size):
+            comment_data = json.dumps({
+                "id": external_id,
+                "parent": parent_id or "",
+                "author": author,
+                "text": text,
+                "date": created_date.astimezone(datetime.timezone.utc).isoformat().replace("+00:00", "Z"),
+                "likes": likes,
+                "image": image
+            })
+            if fmt == "ndjson":
+                f.write(comment_data + "\n")
+            else:
+                f.write((",\n" if count else "") + "        " + comment_data)
+            count += 1
+        
+        if fmt == "json":
+            f.write("\n    ]\n}\n")
+    
+    logging.info(f"Exported {count} comments to {out_file}")
+    return count
+
+
+def hot_score(likes, reply_count, created_date, now=None) -> float:
+    now = now or timezone.now()
+    age = min(now - created_date, HOT_SCORE_HORIZON)
+    age_hours = max(age.total_seconds() / 3600, 0)
+    return (likes + 2 * reply_count + 1) / (age_hours + 2) ** HOT_SCORE_GRAVITY
+
+
+def refresh_hot_scores(comment_ids):
+    """Recomputes hot_score for just these comments, called after anything that moves a score"""
+    now = timezone.now()
+    comments = list(
+        Comment.all_objects.filter(id__in=set(comment_ids)).only("id", "likes", "reply_count", "created_date")
+    )
+    for comment in comments:
+        comment.hot_score = hot_score(comment.likes, comment.reply_count, comment.created_date, now)
+    Comment.all_objects.bulk_update(comments, ["hot_score"], batch_size=500)
+
+
+def like_comment(comment: Comment) -> Comment:
+    Comment.objects.filter(pk=comment.pk).update(likes=F("likes") + 1)
+    refresh_hot_scores([comment.pk])
+    record_author_activity(comment.author_id, likes=1)
+    comment.refresh_from_db()
+    return comment
+
+
+def add_reply(parent: Comment, reply: Comment):
+    Comment.objects.filter(pk=parent.pk).update(reply_count=F("reply_count") + 1)
+    refresh_hot_scores([parent.pk, reply.pk])
+
+
+def remove_reply(parent_id):
+    Comment.all_objects.filter(pk=parent_id, reply_count__gt=0).update(reply_count=F("reply_count") - 1)
+    refresh_hot_scores([parent_id])
+
+
+def decay_hot_scores(batch_size=500) -> int:
+    """
+    Re-decays every live comment still inside HOT_SCORE_HORIZON.  A comment that just crossed it is
+    frozen on this pass and skipped from then on, so the work stays proportional to recent comments.
+    """
+    now = timezone.now()
+    still_decaying = now - HOT_SCORE_HORIZON - HOT_SCORE_FREEZE_GRACE
+    last_id = 0
+    updated = 0
+    while True:
+        comments = list(
+            Comment.objects
+            .filter(created_date__gte=still_decaying, id__gt=last_id)
+            .order_by("id")
+            .only("id", "likes", "reply_count", "created_date")[:batch_size]
+        )
+        if not comments:
+            break
+        
+        for comment in comments:
+            comment.hot_score = hot_score(comment.likes, comment.reply_count, comment.created_date, now)
+        Comment.all_objects.bulk_update(comments, ["hot_score"])
+        updated += len(comments)
+        last_id = comments[-1].id
+    
+    logging.info(f"Re-decayed {updated} comment scores")
+    return updated
+
+
+def record_author_activity(author_id, comments=0, likes=0, activity_date=None):
+    """Applies a delta to one person's AuthorStats row, creating it on first use"""
+    AuthorStats.objects.get_or_create(person_id=author_id)
+    
+    updates = {
+        "comment_count": F("comment_count") + comments,
+        "total_likes": F("total_likes") + likes
+    }
+    if activity_date:
+        updates["last_activity_date"] = Greatest(Coalesce("last_activity_date", activity_date), activity_date)
+    AuthorStats.objects.filter(person_id=author_id).update(**updates)
+
+
+def remove_from_author_stats(comment_rows):
+    """comment_rows are (author_id, likes) pairs for comments that just stopped being visible"""
+    deltas = {}
+    for author_id, likes in comment_rows:
+        comment_count, total_likes = deltas.get(author_id, (0, 0))
+        deltas[author_id] = (comment_count - 1, total_likes - (likes or 0))
+    
+    for author_id, (comment_count, total_likes) in deltas.items():
+        record_author_activity(author_id, comments=comment_count, likes=total_likes)
+
+
+def rebuild_author_stats(author_ids=None) -> int:
+    """Recounts AuthorStats from the comment table, for every person or just author_ids"""
+    comments = Comment.objects.all()
+    people = Person.objects.all()
+    if author_ids is not None:
+        author_ids = list(author_ids)
+        comments = comments.filter(author_id__in=author_ids)
+        people = people.filter(id__in=author_ids)
+    
+    totals = {
+        row["author_id"]: row
+        for row in comments.order_by().values("author_id").annotate(
+            comment_count=Count("id"),
+            total_likes=Sum("likes"),
+            last_activity_date=Max("created_date")
+        )
+    }
+    
+    stats = []
+    for person_id in people.values_list("id", flat=True):
+        row = totals.get(person_id, {})
+        stats.append(AuthorStats(
+            person_id=person_id,
+            comment_count=row.get("comment_count", 0),
+            total_likes=row.get("total_likes") or 0,
+            last_activity_date=row.get("last_activity_date")
+        ))
+    
+    with transaction.atomic():
+        AuthorStats.objects.filter(person_id__in=[s.person_id for s in stats]).delete()
+        AuthorStats.objects.bulk_create(stats, batch_size=500)
+    return len(stats)
+
+
+def comment_thread(comment: Comment, max_depth=None) -> dict:
+    """
+    The reply tree under comment read from the database, one query per level, in the same shape as
+    thread_index.ThreadIndex.thread
+    """
+    root = {"id": comment.id, "reply_count": comment.reply_count, "replies": []}
+    level = {comment.id: root}
+    # a reply is never older than its parent, so each level only reads partitions from the oldest parent on
+    level_start = comment.created_date
+    depth = 0
+    while level and (max_depth is None or depth < max_depth):
+        replies = (
+            Comment.objects.filter(parent_comment_id__in=list(level), created_date__gte=level_start)
+            .order_by("id")
+            .values_list("id", "parent_comment_id", "reply_count", "created_date")
+        )
+        next_level = {}
+        next_level_start = None
+        for reply_id, parent_id, reply_count, created_date in replies:
+            node = {"id": reply_id, "reply_count": reply_count, "replies": []}
+            level[parent_id]["replies"].append(node)
+            next_level[reply_id] = node
+            if next_level_start is None or created_date < next_level_start:
+                next_level_start = created_date
+        level = next_level
+        level_start = next_level_start
+        depth += 1
+    return root
+
+
+def add_missing_ancestors(comments: list, queryset) -> list:
+    """
+    Adds the ancestors a filter left out of comments, read through queryset so they come back with the
+    same columns (created_date among them).  Deleted ancestors aren't in it, prune_orphans still drops
+    the replies under them.
+    """
+    seen = {comment.id for comment in comments}
+    orphans = [c for c in comments if c.parent_comment_id and c.parent_comment_id not in seen]
+    while orphans:
+        # a parent is never newer than its reply, which keeps postgres off the newer partitions
+        ancestors = list(queryset.filter(
+            pk__in={c.parent_comment_id for c in orphans},
+            created_date__lte=max(c.created_date for c in orphans)
+        ))
+        comments.extend(ancestors)
+        seen.update(ancestor.id for ancestor in ancestors)
+        orphans = [a for a in ancestors if a.parent_comment_id and a.parent_comment_id not in seen]
+    return comments
 
 
+def hidden_by_deleted_ancestor(comment_ids) -> set:
+    """
+    The comment_ids that hang off a soft-deleted comment somewhere up their thread.  Only the
+    deleted comment itself is marked, its replies stay readable by id until the purge reaches
+    them, so single comment reads check their ancestors with this.
+    """
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return set()
+    
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(comment_ids))
+    # walks up from each comment until the root or the first deleted ancestor
+    ancestors = Comment.all_objects.raw(f"""
+        WITH RECURSIVE ancestors (comment_id, parent_id, deleted_date, created_date) AS (
+            SELECT id, parent_comment_id, deleted_date, created_date FROM {table} WHERE id IN ({placeholders})
+            UNION ALL
+            SELECT ancestors.comment_id, parent.parent_comment_id, parent.deleted_date, parent.created_date
+            FROM {table} AS parent JOIN ancestors ON parent.id = ancestors.parent_id
+            WHERE ancestors.deleted_date IS NULL AND parent.created_date <= ancestors.created_date
+        )
+        SELECT DISTINCT comment_id AS id FROM ancestors WHERE deleted_date IS NOT NULL
+    """, comment_ids)
+    return {comment.id for comment in ancestors}
+
+
+def forget_archived_comments(author_totals, reply_totals):
+    """
+    Takes comments that were archived out of the live table off the counters that included them.
+    author_totals are (author_id, comment_count, likes) and reply_totals (parent_id, reply_count)
+    for the archived rows that were still visible.
+    """
+    for author_id, comment_count, likes in author_totals:
+        record_author_activity(author_id, comments=-comment_count, likes=-(likes or 0))
+    
+    for parent_id, reply_count in reply_totals:
+        Comment.all_objects.filter(pk=parent_id).update(reply_count=Greatest(F("reply_count") - reply_count, 0))
+    refresh_hot_scores([parent_id for parent_id, _ in reply_totals])
+
+
+def prune_orphans(comments: list) -> list:
+    """
+    Drops comments that hang off a soft-deleted comment.  Only the deleted comment itself is
+    marked, so its replies stay in the table until the purge gets to them.
+    """
+    by_id = {c.id: c for c in comments}
+    reachable = {}
+    for comment in comments:
+        chain = []
+        seen = set()
+        node = comment
+        while True:
+            if node.id in reachable:
+                ok = reachable[node.id]
+                break
+            chain.append(node.id)
+            seen.add(node.id)
+            if not node.parent_comment_id:
+                ok = True
+                break
+            node = by_id.get(node.parent_comment_id)
+            if node is None or node.id in seen:
+                ok = False
+                break
+        
+        for comment_id in chain:
+            reachable[comment_id] = ok
+    
+    return [c for c in comments if reachable[c.id]]
+
+
+def purge_deleted_comments(batch_size=500) -> int:
+    """
+    Hard deletes soft-deleted comments and their replies in small batches, each in its own
+    transaction, so a big thread never holds locks for the whole purge.
+    
+    Deleted marks are first pushed down the thread one batch at a time, then deleted rows
+    without children are removed leaf first with plain SQL.  Returns the number of rows deleted.
+    """
+    purged = 0
+    while True:
+        if _mark_deleted_children(batch_size):
+            continue
+        
+        deleted = _delete_deleted_leaves(batch_size)
+        if not deleted:
+            break
+        purged += deleted
+    
+    if purged:
+        logging.info(f"Purged {purged} deleted comments")
+    return purged
+
+
+def _mark_deleted_children(batch_size) -> int:
+    with transaction.atomic():
+        # several purges can run at once, each takes the rows no other one has locked
+        children = list(
+            Comment.all_objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .filter(deleted_date__isnull=True, parent_comment__deleted_date__isnull=False)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not children:
+            return 0
+        
+        marked_date = timezone.now()
+        Comment.all_objects.filter(id__in=children, deleted_date__isnull=True).update(deleted_date=marked_date)
+        # only the rows this update marked come off the stats, never one that was already counted down
+        marked = list(
+            Comment.all_objects.filter(id__in=children, deleted_date=marked_date).values_list("author_id", "likes")
+        )
+        remove_from_author_stats(marked)
+        return len(marked)
+
+
+def _delete_deleted_leaves(batch_size) -> int:
+    with transaction.atomic():
+        leaf_ids = list(
+            Comment.all_objects
+            .filter(deleted_date__isnull=False, comment__isnull=True)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not leaf_ids:
+            return 0
+        
+        # skip the django collector, anything that raced in underneath is cascaded by the db
+        table = connection.ops.quote_name(Comment._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(leaf_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", leaf_ids)
+            return cursor.rowcount
@@ -0,0 +1,226 @@
+"""
+Monthly range partitioning of the comment table on created_date (postgres only).
+
+Partitioning is opt in, `manage.py partition_comments --convert` rewrites api_comment as a
+partitioned table.  Postgres needs the partition key in every unique constraint, so the primary
+key becomes (id, created_date), external_id keeps a plain index instead of a unique one (the
+importer upserts on it) and the parent_comment FK constraint is dropped, the purge and
+prune_orphans already cope with replies whose parent is gone.
+
+Every other function here is a no-op until the table has been converted, so sqlite and
+unpartitioned databases keep working unchanged.
+"""
+import datetime
+import gzip
+import logging
+import re
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api import comment_manager, thread_index
+from api.models import Comment
+
+TABLE = Comment._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(d: datetime.datetime) -> datetime.datetime:
+    if timezone.is_aware(d):
+        d = d.astimezone(datetime.timezone.utc)
+    return datetime.datetime(d.year, d.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_months(d: datetime.datetime, months: int) -> datetime.datetime:
+    month_index = d.year * 12 + d.month - 1 + months
+    return d.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f"{TABLE}_p{month.year}_{month.month:02d}"
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def convert_to_partitioned(months_ahead=3):
+    """Rewrites api_comment as a table partitioned by created_date month"""
+    if connection.vendor != 'postgresql':
+        raise ValueError("comment partitioning needs postgres")
+    if is_partitioned():
+        logging.info(f"{TABLE} is already partitioned")
+        return
+
+    legacy = f"{TABLE}_unpartitioned"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {legacy}")
+
+        # take the secondary indexes off the old table so they can be recreated under the same names
+        cursor.execute(
+            """
+            SELECT i.indexname, i.indexdef, c.contype FROM pg_indexes i
+            LEFT JOIN pg_constraint c ON c.conname = i.indexname AND c.conrelid = to_regclass(%s)
+            WHERE i.tablename = %s AND c.contype IS DISTINCT FROM 'p'
+            """,
+            [legacy, legacy]
+        )
+        indexes = cursor.fetchall()
+        for index_name, _, constraint_type in indexes:
+            if constraint_type:
+                cursor.execute(f'ALTER TABLE {legacy} DROP CONSTRAINT "{index_name}"')
+            else:
+                cursor.execute(f'DROP INDEX "{index_name}"')
+
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_date)"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_date)")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD FOREIGN KEY (author_id) REFERENCES api_person (id) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+        # LIKE doesn't carry the identity over, hand id a sequence of its own
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_partitioned_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_partitioned_id_seq')")
+        for _, index_def, _ in indexes:
+            index_def = index_def.replace("CREATE UNIQUE INDEX", "CREATE INDEX")
+            cursor.execute(re.sub(rf" ON (\S+\.)?{legacy} ", f" ON {TABLE} ", index_def))
+
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"SELECT min(created_date) FROM {legacy}")
+        first_date = cursor.fetchone()[0] or timezone.now()
+        ensure_partitions(first_date, timezone.now(), months_ahead=months_ahead)
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {legacy}")
+        cursor.execute(
+            f"SELECT setval('{TABLE}_partitioned_id_seq', COALESCE(MAX(id), 1)) FROM {TABLE}"
+        )
+        # only after the copy, the rows are the same ones the thread indexes already hold
+        cursor.execute(thread_index.NOTIFY_TRIGGER_SQL)
+        cursor.execute(f"DROP TABLE {legacy}")
+
+    logging.info(f"Converted {TABLE} to monthly partitions")
+
+
+def ensure_partitions(start: datetime.datetime, end: datetime.datetime, months_ahead=0) -> list:
+    """
+    Makes sure a partition exists for every month from start through months_ahead past end.
+    Rows that already landed in the default partition for a new month are moved into it.
+    """
+    if not is_partitioned():
+        return []
+
+    existing = existing_partitions()
+    created = []
+    month = month_start(start)
+    last_month = add_months(month_start(end), months_ahead)
+    while month <= last_month:
+        name = partition_name(month)
+        if name not in existing:
+            _create_partition(name, month, add_months(month, 1))
+            created.append(name)
+        month = add_months(month, 1)
+
+    if created:
+        logging.info(f"Created comment partitions {', '.join(created)}")
+    return created
+
+
+def ensure_partitions_for_dates(dates) -> list:
+    """Used by the importer so incoming rows route to their month instead of the default partition"""
+    if not dates or not is_partitioned():
+        return []
+    months = sorted({month_start(d) for d in dates})
+    return ensure_partitions(months[0], months[-1])
+
+
+def existing_partitions() -> set:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLE]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _create_partition(name, lower, upper):
+    with transaction.atomic(), connection.cursor() as cursor:
+        # build it standalone so any rows sitting in the default partition can be moved over
+        # before attaching, otherwise postgres refuses to create the overlapping partition
+        cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS ("
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE created_date >= %s AND created_date < %s RETURNING *"
+            f") INSERT INTO {name} SELECT * FROM moved",
+            [lower, upper]
+        )
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper]
+        )
+
+
+def archive_partitions(older_than: datetime.datetime, archive_dir: Path) -> list:
+    """
+    Detaches every monthly partition that ends on or before older_than, writes it to
+    <archive_dir>/<partition>.csv.gz and drops it.  Each partition is handled in its own
+    transaction, a failed export leaves the partition attached.
+    """
+    if not is_partitioned():
+        raise ValueError(f"{TABLE} is not partitioned")
+
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    archived = []
+    cutoff = month_start(older_than)
+    for name in sorted(existing_partitions()):
+        match = re.fullmatch(rf"{TABLE}_p(\d{{4}})_(\d{{2}})", name)
+        if not match:
+            continue
+        month = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+        if add_months(month, 1) > cutoff:
+            continue
+
+        archive_file = archive_dir / f"{name}.csv.gz"
+        tmp_file = archive_file.with_suffix(".tmp")
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            with gzip.open(tmp_file, "wb") as f, cursor.copy(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+                for data in copy:
+                    f.write(data)
+            _forget_archived(cursor, name)
+            tmp_file.rename(archive_file)
+            cursor.execute(f"DROP TABLE {name}")
+
+        logging.info(f"Archived {name} to {archive_file}")
+        archived.append(archive_file)
+
+    return archived
+
+
+def _forget_archived(cursor, name):
+    # the rows leave without a delete, so nothing else takes them off AuthorStats, their parents'
+    # reply counts or the thread indexes
+    cursor.execute(
+        f"SELECT author_id, count(*), sum(likes) FROM {name} WHERE deleted_date IS NULL GROUP BY author_id"
+    )
+    author_totals = cursor.fetchall()
+    cursor.execute(
+        f"SELECT parent_comment_id, count(*) FROM {name} "
+        f"WHERE deleted_date IS NULL AND parent_comment_id IS NOT NULL GROUP BY parent_comment_id"
+    )
+    reply_totals = cursor.fetchall()
+    comment_manager.forget_archived_comments(author_totals, reply_totals)
+    cursor.execute("SELECT pg_notify(%s, %s)", [thread_index.CHANNEL, thread_index.RESYNC_PAYLOAD])
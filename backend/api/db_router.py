@@ -0,0 +1,127 @@
+"""
+Read replica routing.
+
+Only read-only HTTP requests are sent to a replica, ReplicaPinningMiddleware flags them.  Writes,
+management commands and anything else stay on default.  After a write the client is pinned to
+default for REPLICA_PIN_SECONDS so it always sees its own changes.  The response carries the pin
+both as a cookie, for same site clients, and as a PIN_HEADER deadline for cross site ones (the ui
+on another port, whose browser won't keep a SameSite cookie), which they send back on every request.
+
+A replica is skipped while it is unreachable or further behind than REPLICA_MAX_LAG_SECONDS,
+the check is cached per process for REPLICA_HEALTH_CHECK_SECONDS.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "pin_primary"
+# unix time until which reads stay on default, echoed back by the client
+PIN_HEADER = "X-Pin-Primary-Until"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_reads_use_replica = contextvars.ContextVar("reads_use_replica", default=False)
+
+# alias -> (monotonic time checked, healthy)
+_replica_health = {}
+
+
+def reads_use_replica() -> bool:
+    return _reads_use_replica.get()
+
+
+def replica_is_healthy(alias) -> bool:
+    checked_at, healthy = _replica_health.get(alias, (None, False))
+    if checked_at is not None and time.monotonic() - checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+        return healthy
+
+    healthy = _check_replica(alias)
+    _replica_health[alias] = (time.monotonic(), healthy)
+    return healthy
+
+
+def _check_replica(alias) -> bool:
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(REPLICA_LAG_SQL)
+                lag = float(cursor.fetchone()[0])
+            else:
+                cursor.execute("SELECT 1")
+                lag = 0
+    except (DatabaseError, ConnectionDoesNotExist) as e:
+        logger.warning(f"Replica {alias} is unavailable, reading from default: {e}")
+        return False
+
+    if lag > settings.REPLICA_MAX_LAG_SECONDS:
+        logger.warning(f"Replica {alias} is {lag:.1f}s behind, reading from default")
+        return False
+    return True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reads_use_replica():
+            return None
+
+        replicas = list(settings.DATABASE_REPLICAS)
+        random.shuffle(replicas)
+        for alias in replicas:
+            if replica_is_healthy(alias):
+                return alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        use_replica = not is_write and PIN_COOKIE not in request.COOKIES and not _header_pinned(request)
+
+        token = _reads_use_replica.set(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            _reads_use_replica.reset(token)
+
+        if is_write:
+            response.set_cookie(PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, samesite="Lax")
+            response[PIN_HEADER] = f"{time.time() + settings.REPLICA_PIN_SECONDS:.3f}"
+        return response
+
+
+def _header_pinned(request) -> bool:
+    try:
+        return float(request.headers.get(PIN_HEADER, 0)) > time.time()
+    except ValueError:
+        return False
@@ -0,0 +1,184 @@
+"""
+Background comment imports started over http.
+
+An upload is streamed to IMPORT_JOB_DIR, in one request or in chunks, and queued as an ImportJob.
+run_import_worker claims queued jobs and ingests them in batches through comment_follow, which
+checkpoints the byte offset with every batch, so a job whose worker died is picked up again from
+its last committed batch once its heartbeat goes stale.  Everything runs off the database, there
+is no queue service.
+"""
+import json
+import logging
+import re
+import shutil
+import threading
+import time
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from api import comment_follow, comment_manager
+from api.models import ImportJob
+
+# a running job whose heartbeat is older than this is assumed to have lost its worker
+STALE_AFTER = timezone.timedelta(seconds=60)
+HEARTBEAT_INTERVAL = STALE_AFTER.total_seconds() / 4
+
+COMMENTS_ARRAY = re.compile(r'"comments"\s*:\s*\[')
+WHITESPACE_AND_COMMAS = re.compile(r'[\s,]*')
+
+
+def create_job(upload, fmt="ndjson", chunked=False) -> ImportJob:
+    """upload is a file like object (the request) holding the whole file, or its first chunk when chunked"""
+    if fmt not in comment_manager.EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(comment_manager.EXPORT_FORMATS)}")
+
+    job = ImportJob.objects.create(format=fmt, status=ImportJob.UPLOADING)
+    job.upload_path().parent.mkdir(parents=True, exist_ok=True)
+    append_chunk(job, upload, last=not chunked)
+    return job
+
+
+def append_chunk(job: ImportJob, upload, last=False, offset=None):
+    """offset is where the client thinks the chunk goes, a retried chunk that already landed is turned away"""
+    if job.status != ImportJob.UPLOADING:
+        raise ValueError(f"import job {job.id} is {job.status}, not uploading")
+
+    uploaded = job.upload_path().stat().st_size if job.upload_path().exists() else 0
+    if offset is not None and offset != uploaded:
+        raise ValueError(f"chunk offset {offset} doesn't match the {uploaded} bytes uploaded so far")
+
+    with open(job.upload_path(), "ab") as f:
+        shutil.copyfileobj(upload, f)
+
+    if last:
+        with open(job.upload_path(), "ab+") as f:
+            # the reader only takes complete lines, make sure the last one is
+            f.seek(0, 2)
+            if job.format == "ndjson" and f.tell():
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        job.status = ImportJob.QUEUED
+    job.total_bytes = job.upload_path().stat().st_size
+    job.save()
+
+
+def claim_next_job():
+    stale = timezone.now() - STALE_AFTER
+    candidates = (
+        ImportJob.objects
+        .filter(Q(status=ImportJob.QUEUED) | Q(status=ImportJob.RUNNING, updated_date__lt=stale))
+        .order_by("created_date")
+    )
+    for job in candidates[:10]:
+        # only one worker wins the update if two race for the same job
+        claimed = ImportJob.objects.filter(
+            pk=job.pk, status=job.status, updated_date=job.updated_date
+        ).update(status=ImportJob.RUNNING, updated_date=timezone.now())
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job: ImportJob, batch_size=500):
+    if job.rows_processed or job.bytes_processed:
+        logging.info(f"Resuming import job {job.id} at byte {job.bytes_processed}")
+    job.started_date = job.started_date or timezone.now()
+    job.save()
+
+    # slow conversions and batches mustn't look like a dead worker
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job.pk, stop_heartbeat), daemon=True)
+    heartbeat.start()
+    try:
+        ingest_path = job.ingest_path()
+        if job.format == "json" and not ingest_path.exists():
+            _convert_to_ndjson(job)
+        job.total_bytes = ingest_path.stat().st_size
+        job.save()
+
+        def on_batch(comment_count, offset, errors):
+            job.rows_processed += comment_count
+            job.bytes_processed = offset
+            job.errors = (job.errors + errors)[-ImportJob.MAX_ERRORS:]
+            job.save()
+
+        comment_follow.ingest_appended(ingest_path, batch_size, on_batch=on_batch)
+        job.status = ImportJob.DONE
+    except Exception as e:
+        logging.exception(f"Import job {job.id} failed")
+        job.status = ImportJob.FAILED
+        job.errors = (job.errors + [str(e)])[-ImportJob.MAX_ERRORS:]
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+    job.finished_date = timezone.now()
+    job.save()
+    logging.info(f"Import job {job.id} {job.status} after {job.rows_processed} comments")
+
+
+def run_worker(batch_size=500, poll_interval=2.0, once=False):
+    while True:
+        job = claim_next_job()
+        if job:
+            run_job(job, batch_size)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
+def _heartbeat(job_id, stopped: threading.Event):
+    while not stopped.wait(HEARTBEAT_INTERVAL):
+        try:
+            ImportJob.objects.filter(pk=job_id, status=ImportJob.RUNNING).update(updated_date=timezone.now())
+        except DatabaseError as e:
+            logging.warning(f"Import job {job_id} heartbeat failed: {e}")
+    # the updates ran on this thread's own connection
+    connections.close_all()
+
+
+def _convert_to_ndjson(job: ImportJob):
+    tmp_path = job.ingest_path().with_suffix(".tmp")
+    with open(job.upload_path(), encoding="utf-8") as upload, open(tmp_path, "w", encoding="utf-8") as f:
+        for comment_data in _stream_json_comments(upload):
+            f.write(json.dumps(comment_data) + "\n")
+    tmp_path.rename(job.ingest_path())
+
+
+def _stream_json_comments(f, chunk_size=1 << 16):
+    """Yields the entries of a {"comments": [...]} file one by one, only a chunk of it is ever in memory"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    at_end = False
+    while True:
+        match = COMMENTS_ARRAY.search(buffer)
+        if match:
+            position = match.end()
+            break
+        if at_end:
+            return
+        chunk = f.read(chunk_size)
+        at_end = not chunk
+        buffer += chunk
+
+    while True:
+        position = WHITESPACE_AND_COMMAS.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            comment_data, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # the entry runs past the end of the buffer
+            if at_end:
+                raise
+            chunk = f.read(chunk_size)
+            at_end = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield comment_data
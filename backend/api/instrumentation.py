@@ -0,0 +1,121 @@
+"""
+Runtime stats for the db layer, served by the metrics endpoint and printed by the benchmarks, and
+the startup cost of a wsgi worker for bench_settings_profiles.
+"""
+import io
+import statistics
+import sys
+import time
+
+from django.db import connections
+
+
+def db_pool_stats() -> dict:
+    """
+    Per db alias connection stats.  Pooled aliases report psycopg_pool's counters, wait times in
+    ms and checkouts (requests_num) are totals since the pool was opened in this process.
+    """
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        pool = getattr(connection, "pool", None)
+        if pool is None:
+            stats[alias] = {
+                "pooled": False,
+                "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+                "connected": connection.connection is not None,
+            }
+            continue
+
+        pool_stats = pool.get_stats()
+        checkouts = pool_stats.get("requests_num", 0)
+        wait_ms = pool_stats.get("requests_wait_ms", 0)
+        stats[alias] = {
+            "pooled": True,
+            "pool_min": pool_stats.get("pool_min"),
+            "pool_max": pool_stats.get("pool_max"),
+            "pool_size": pool_stats.get("pool_size"),
+            "pool_available": pool_stats.get("pool_available"),
+            "requests_waiting": pool_stats.get("requests_waiting"),
+            "checkouts": checkouts,
+            "checkouts_queued": pool_stats.get("requests_queued", 0),
+            "checkout_errors": pool_stats.get("requests_errors", 0),
+            "wait_ms_total": wait_ms,
+            "wait_ms_avg": wait_ms / checkouts if checkouts else 0,
+            "connections_opened": pool_stats.get("connections_num", 0),
+        }
+    return stats
+
+
+def wsgi_worker_stats(started, request_count=2000, path="/api/v1/metrics/db/") -> dict:
+    """
+    Loads api.wsgi under the current DJANGO_SETTINGS_MODULE in a fresh interpreter and measures it.
+    started is time.perf_counter() from before django was imported.  The default path doesn't query
+    the database, so the per request numbers are the handler's own, middleware_us is what a request
+    costs on top of calling its view directly.
+    """
+    from api.wsgi import application
+
+    def wsgi_environ():
+        return {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+        }
+
+    def handle():
+        response = application(wsgi_environ(), lambda status, headers: None)
+        b"".join(response)
+        response.close()
+
+    # the url conf and views are only imported by the first request
+    handle()
+    cold_start_ms = (time.perf_counter() - started) * 1000
+    rss_mb = _rss_mb()
+    module_count = len(sys.modules)
+
+    from django.core.handlers.wsgi import WSGIRequest
+    from django.urls import resolve
+
+    view = resolve(path).func
+    handler_times = []
+    view_times = []
+    for _ in range(request_count):
+        start = time.perf_counter()
+        handle()
+        handler_times.append(time.perf_counter() - start)
+
+        request = WSGIRequest(wsgi_environ())
+        start = time.perf_counter()
+        view(request)
+        view_times.append(time.perf_counter() - start)
+
+    request_us = statistics.median(handler_times) * 1e6
+    view_us = statistics.median(view_times) * 1e6
+    return {
+        "cold_start_ms": cold_start_ms,
+        "rss_mb": rss_mb,
+        "modules": module_count,
+        "request_us": request_us,
+        "middleware_us": request_us - view_us,
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # no procfs, fall back to the peak, in bytes on macos and KB elsewhere
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
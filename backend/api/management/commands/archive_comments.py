@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import comment_partitions
+
+
+class Command(BaseCommand):
+    help = "Detach comment partitions older than --months and export them to gzipped csv"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            required=False,
+            help="keep this many months of comments in the live table"
+        )
+        
+        parser.add_argument(
+            '--archive_dir',
+            type=str,
+            default="../data/archive",
+            required=False
+        )
+    
+    def handle(self, *args, **options):
+        older_than = comment_partitions.add_months(
+            comment_partitions.month_start(timezone.now()),
+            -options.get("months")
+        )
+        comment_partitions.archive_partitions(older_than, options.get("archive_dir"))
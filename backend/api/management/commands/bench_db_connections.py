@@ -0,0 +1,81 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import reverse
+
+from api import instrumentation
+
+# env overrides for each connection mode, settings.py reads these at startup
+MODES = {
+    "no_reuse": {"DB_POOL_MAX_SIZE": "0", "DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_POOL_MAX_SIZE": "0", "DB_CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL_MAX_SIZE": "4", "DB_POOL_MIN_SIZE": "2"},
+}
+
+
+class Command(BaseCommand):
+    help = "Compare list endpoint latency with no connection reuse, persistent connections and the pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            required=False
+        )
+
+        parser.add_argument(
+            '--mode',
+            choices=list(MODES),
+            required=False,
+            help="run a single mode in this process, used internally"
+        )
+
+    def handle(self, *args, **options):
+        if options.get("mode"):
+            self.stdout.write(json.dumps(self.run_requests(options.get("requests"))))
+            return
+
+        # settings are fixed once django is set up, so every mode gets a fresh process
+        for mode, env in MODES.items():
+            result = subprocess.run(
+                [sys.executable, "manage.py", "bench_db_connections",
+                 "--mode", mode, "--requests", str(options.get("requests"))],
+                env={**os.environ, **env},
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            self.stdout.write(
+                f"{mode:<12} mean {stats['mean_ms']:>7.2f} ms  p50 {stats['p50_ms']:>7.2f} ms  "
+                f"p95 {stats['p95_ms']:>7.2f} ms  db {json.dumps(stats['db']['default'])}"
+            )
+
+    def run_requests(self, request_count) -> dict:
+        client = Client(HTTP_HOST="localhost")
+        url = reverse('get_all_comments')
+
+        latencies = []
+        for _ in range(request_count):
+            start = time.perf_counter()
+            # the test client skips the handler's connection cleanup, do what a real request does
+            close_old_connections()
+            client.get(url)
+            close_old_connections()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        latencies.sort()
+        return {
+            "mean_ms": statistics.mean(latencies),
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[int(len(latencies) * 0.95)],
+            "db": instrumentation.db_pool_stats(),
+        }
@@ -0,0 +1,75 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PROFILES = ["api.settings", "api.settings_api"]
+
+# a fresh interpreter per run, the clock starts before django is imported
+WORKER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from api import instrumentation
+print(json.dumps(instrumentation.wsgi_worker_stats(started, int(sys.argv[1]))))
+"""
+
+COLUMNS = ["cold_start_ms", "rss_mb", "modules", "request_us", "middleware_us"]
+
+
+class Command(BaseCommand):
+    help = "Compare worker cold start, RSS and per request middleware overhead across settings modules"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            default=PROFILES,
+            required=False,
+            help="settings modules to compare, the first one is the baseline"
+        )
+
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            required=False,
+            help="fresh worker processes per profile, medians are reported"
+        )
+
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            required=False
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options.get("profiles"):
+            runs = [self.run_worker(profile, options.get("requests")) for _ in range(options.get("runs"))]
+            results[profile] = {column: statistics.median(run[column] for run in runs) for column in COLUMNS}
+
+        baseline = results[options.get("profiles")[0]]
+        self.stdout.write(f"{'profile':<24}" + "".join(f"{column:>16}" for column in COLUMNS))
+        for profile, stats in results.items():
+            self.stdout.write(f"{profile:<24}" + "".join(f"{stats[column]:>16.1f}" for column in COLUMNS))
+            if stats is not baseline:
+                self.stdout.write(f"{'  vs baseline':<24}" + "".join(
+                    f"{(stats[column] - baseline[column]) / baseline[column]:>+16.0%}" if baseline[column] else f"{'':>16}"
+                    for column in COLUMNS
+                ))
+
+    def run_worker(self, profile, request_count) -> dict:
+        result = subprocess.run(
+            [sys.executable, "-c", WORKER_SCRIPT, str(request_count)],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": profile},
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import comment_manager
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=500,
+            required=False
+        )
+        
+        parser.add_argument(
+            '--loop',
+            action="store_true",
+            help="keep running as a background worker instead of exiting after one pass"
+        )
+        
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=600,
+            required=False,
+            help="seconds to sleep between passes when --loop is set"
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            comment_manager.decay_hot_scores(options.get("batch_size"))
+            if not options.get("loop"):
+                break
+            time.sleep(options.get("interval"))
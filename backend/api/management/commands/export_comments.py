@@ -0,0 +1,103 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import comment_manager
+from api.models import Comment
+
+
+class Command(BaseCommand):
+    help = "Stream comments back out in the import format, optionally split by time range across processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--out',
+            type=str,
+            default="../data/export.json",
+            required=False,
+            help="output file, a .gz suffix gzips it"
+        )
+
+        parser.add_argument(
+            '--format',
+            choices=comment_manager.EXPORT_FORMATS,
+            default="json",
+            required=False
+        )
+
+        parser.add_argument(
+            '--since',
+            type=str,
+            required=False,
+            help="only comments created at or after this iso datetime"
+        )
+
+        parser.add_argument(
+            '--until',
+            type=str,
+            required=False,
+            help="only comments created before this iso datetime"
+        )
+
+        parser.add_argument(
+            '--parallel',
+            type=int,
+            default=1,
+            required=False,
+            help="split the time range into this many parts, each exported by its own process"
+        )
+
+    def handle(self, *args, **options):
+        since = self.parse_date(options.get("since"))
+        until = self.parse_date(options.get("until"))
+        # the part processes run from BASE_DIR, so they need the path as seen from here
+        out_file = Path(options.get("out")).resolve()
+
+        if options.get("parallel") <= 1:
+            comment_manager.export_comments(out_file, options.get("format"), since, until)
+            return
+
+        bounds = Comment.objects.aggregate(first=Min("created_date"), last=Max("created_date"))
+        if bounds["first"] is None:
+            comment_manager.export_comments(out_file, options.get("format"), since, until)
+            return
+
+        start = since or bounds["first"]
+        end = until or bounds["last"] + timezone.timedelta(microseconds=1)
+        step = (end - start) / options.get("parallel")
+
+        # part files sit next to out_file, eg export.part01.ndjson.gz
+        stem = out_file.name[:len(out_file.name) - len("".join(out_file.suffixes))]
+        workers = []
+        for part in range(options.get("parallel")):
+            part_since = start + step * part
+            part_until = end if part == options.get("parallel") - 1 else start + step * (part + 1)
+            part_file = out_file.with_name(f"{stem}.part{part + 1:02d}{''.join(out_file.suffixes)}")
+            workers.append(subprocess.Popen([
+                sys.executable, str(settings.BASE_DIR / "manage.py"), "export_comments",
+                "--out", str(part_file),
+                "--format", options.get("format"),
+                "--since", part_since.isoformat(),
+                "--until", part_until.isoformat(),
+            ], cwd=settings.BASE_DIR))
+
+        failed = [worker.args for worker in workers if worker.wait() != 0]
+        if failed:
+            raise CommandError(f"{len(failed)} export parts failed")
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if not parsed:
+            raise CommandError(f"{value} is not an iso datetime")
+        # created_date is aware, a date without an offset is taken in TIME_ZONE
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
@@ -1,6 +1,6 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from api import comment_manager
+from api import comment_follow, comment_manager
 
 
 class Command(BaseCommand):
@@ -16,8 +16,38 @@ class Command(BaseCommand):
             '--reset',
             action="store_true"
         )
+        
+        parser.add_argument(
+            '--follow',
+            action="store_true",
+            help="keep ingesting lines appended to an ndjson file (or every *.ndjson in a directory)"
+        )
+        
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=500,
+            required=False
+        )
+        
+        parser.add_argument(
+            '--poll_interval',
+            type=float,
+            default=1.0,
+            required=False
+        )
     
     def handle(self, *args, **options):
+        if options.get("follow"):
+            if options.get("reset"):
+                raise CommandError("--reset can't be combined with --follow")
+            comment_follow.follow_comments(
+                options.get("comment_file"),
+                options.get("batch_size"),
+                options.get("poll_interval")
+            )
+            return
+        
         comment_manager.import_comments(
             options.get("comment_file"),
             options.get("reset")
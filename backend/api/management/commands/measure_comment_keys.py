@@ -0,0 +1,100 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from api.models import Comment
+
+
+class Command(BaseCommand):
+    help = (
+        "Report comment index sizes and time pk / parent lookups.  Run it on a copy of the db "
+        "migrated to api 0003 and again at 0004 to compare text and bigint keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=5000,
+            required=False
+        )
+
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=1000,
+            required=False,
+            help="how many rows to pick lookup keys from, only these are read into memory"
+        )
+
+    def handle(self, *args, **options):
+        table = Comment._meta.db_table
+        for index_name, size in self.index_sizes(table):
+            self.stdout.write(f"{index_name:<60} {size / 1024:>10.1f} kB")
+
+        # raw sql on purpose so the same command runs against either schema version
+        rows = self.sample_rows(table, options.get("sample"))
+        if not rows:
+            self.stdout.write("no comments to look up")
+            return
+
+        ids = [random.choice(rows)[0] for _ in range(options.get("lookups"))]
+        parent_ids = [row[1] for row in rows if row[1] is not None] or ids
+        parent_ids = [random.choice(parent_ids) for _ in range(options.get("lookups"))]
+
+        for label, sql, values in [
+            ("pk lookup", f"SELECT * FROM {table} WHERE id = %s", ids),
+            ("children lookup", f"SELECT id FROM {table} WHERE parent_comment_id = %s", parent_ids),
+        ]:
+            with connection.cursor() as cursor:
+                start = time.perf_counter()
+                for value in values:
+                    cursor.execute(sql, [value])
+                    cursor.fetchall()
+                elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:<20} {elapsed / len(values) * 1e6:>10.1f} us/lookup over {len(values)}")
+
+    def index_sizes(self, table) -> list:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+                    "FROM pg_index WHERE indrelid = to_regclass(%s) ORDER BY 1",
+                    [table]
+                )
+                return cursor.fetchall()
+
+            # sqlite keeps a bigint pk in the table b-tree itself, so the table is listed too
+            try:
+                cursor.execute(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE tbl_name = %s) GROUP BY name ORDER BY name",
+                    [table]
+                )
+            except DatabaseError:
+                self.stdout.write("this sqlite build has no dbstat, index sizes skipped")
+                return []
+            return cursor.fetchall()
+
+    def sample_rows(self, table, sample) -> list:
+        """(id, parent_comment_id) for about sample random rows, without reading the whole table"""
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                cursor.execute(f"SELECT id, parent_comment_id FROM {table} ORDER BY random() LIMIT %s", [sample])
+                return cursor.fetchall()
+
+            # planner estimate over the table and its partitions, enough to size the sample
+            cursor.execute(
+                "SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0) FROM pg_class WHERE oid = to_regclass(%s) "
+                "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+                [table, table]
+            )
+            estimated_rows = cursor.fetchone()[0]
+            percent = min(100.0, 400.0 * sample / estimated_rows) if estimated_rows else 100.0
+            cursor.execute(
+                f"SELECT id, parent_comment_id FROM {table} TABLESAMPLE SYSTEM (%s) ORDER BY random() LIMIT %s",
+                [percent, sample]
+            )
+            return cursor.fetchall()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import comment_partitions
+
+
+class Command(BaseCommand):
+    help = "Convert the comment table to monthly partitions and keep future partitions created"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action="store_true",
+            help="rewrite api_comment as a partitioned table (one time, postgres only)"
+        )
+        
+        parser.add_argument(
+            '--months_ahead',
+            type=int,
+            default=3,
+            required=False
+        )
+    
+    def handle(self, *args, **options):
+        if options.get("convert"):
+            comment_partitions.convert_to_partitioned(options.get("months_ahead"))
+        
+        comment_partitions.ensure_partitions(
+            timezone.now(),
+            timezone.now(),
+            months_ahead=options.get("months_ahead")
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import comment_manager
+
+
+class Command(BaseCommand):
+    help = "Recount every person's AuthorStats row from the comment table"
+    
+    def handle(self, *args, **options):
+        rebuilt = comment_manager.rebuild_author_stats()
+        self.stdout.write(f"Rebuilt stats for {rebuilt} authors")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api import import_jobs
+
+
+class Command(BaseCommand):
+    help = "Run uploaded import jobs in the background, resuming any whose worker died"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=500,
+            required=False
+        )
+        
+        parser.add_argument(
+            '--poll_interval',
+            type=float,
+            default=2.0,
+            required=False
+        )
+        
+        parser.add_argument(
+            '--once',
+            action="store_true",
+            help="exit once the queue is empty"
+        )
+    
+    def handle(self, *args, **options):
+        import_jobs.run_worker(
+            options.get("batch_size"),
+            options.get("poll_interval"),
+            options.get("once")
+        )
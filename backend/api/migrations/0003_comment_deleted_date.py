@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+def cascade_parent_in_db(apps, schema_editor):
+    # Push the parent_comment cascade down into postgres so the purge can delete
+    # rows with plain SQL instead of walking the thread in the django collector
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        DO $$
+        DECLARE fk_name text;
+        BEGIN
+            SELECT conname INTO fk_name FROM pg_constraint
+            WHERE conrelid = 'api_comment'::regclass
+              AND confrelid = 'api_comment'::regclass
+              AND contype = 'f';
+            EXECUTE format('ALTER TABLE api_comment DROP CONSTRAINT %I', fk_name);
+            EXECUTE format(
+                'ALTER TABLE api_comment ADD CONSTRAINT %I FOREIGN KEY (parent_comment_id) '
+                'REFERENCES api_comment (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED',
+                fk_name
+            );
+        END $$;
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_comment_parent_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='deleted_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_date__isnull', False)), fields=['deleted_date'], name='comment_pending_purge_idx'),
+        ),
+        migrations.RunPython(cascade_parent_in_db, migrations.RunPython.noop),
+    ]
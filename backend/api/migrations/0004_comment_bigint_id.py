@@ -0,0 +1,138 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+import api.models
+
+
+def check_not_partitioned(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('api_comment')")
+        if cursor.fetchone():
+            raise RuntimeError("migrate the comment keys before running partition_comments --convert")
+
+
+def copy_ids_to_external_id(apps, schema_editor):
+    Comment = apps.get_model('api', 'Comment')
+    Comment.objects.using(schema_editor.connection.alias).update(
+        external_id=models.F('id'),
+        parent_external_id=models.F('parent_comment')
+    )
+
+
+def _numeric_id_sql(vendor, column='id'):
+    # the ids python's str(int(i)) == i keeps, short enough to fit a bigint
+    if vendor == 'postgresql':
+        return f"({column} ~ '^[1-9][0-9]{{0,17}}$')"
+    return f"({column} GLOB '[1-9]*' AND {column} NOT GLOB '*[^0-9]*' AND length({column}) <= 18)"
+
+
+def renumber_ids(apps, schema_editor):
+    # Imported comments already have small numeric ids, those keep their value so links stay
+    # the same.  Everything else (uuid4 strings from the api) gets the next free number, in one
+    # statement however many rows there are.
+    numeric = _numeric_id_sql(schema_editor.connection.vendor)
+    schema_editor.execute(f"""
+        WITH base AS (
+            SELECT COALESCE(MAX(CAST(id AS bigint)), 0) AS max_id FROM api_comment WHERE {numeric}
+        ), numbered AS (
+            SELECT id, row_number() OVER (ORDER BY created_date, id) AS n FROM api_comment WHERE NOT {numeric}
+        )
+        UPDATE api_comment SET id = CAST(numbered.n + base.max_id AS text)
+        FROM numbered, base
+        WHERE api_comment.id = numbered.id
+    """)
+
+
+def link_parents(apps, schema_editor):
+    # replies whose parent isn't there keep a null parent, same as a top level comment
+    schema_editor.execute("""
+        UPDATE api_comment SET parent_comment_id = parent.id
+        FROM api_comment AS parent
+        WHERE parent.external_id = api_comment.parent_external_id
+          AND api_comment.parent_external_id <> ''
+    """)
+    
+    if schema_editor.connection.vendor == 'postgresql':
+        # flush the deferred FK checks, postgres won't alter a table with pending trigger events
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def reset_id_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "SELECT setval(pg_get_serial_sequence('api_comment', 'id'), COALESCE(MAX(id), 1)) FROM api_comment"
+    )
+
+
+def cascade_parent_in_db(apps, schema_editor):
+    # same as 0003, the parent FK was just recreated by django without the db level cascade
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        DO $$
+        DECLARE fk_name text;
+        BEGIN
+            SELECT conname INTO fk_name FROM pg_constraint
+            WHERE conrelid = 'api_comment'::regclass
+              AND confrelid = 'api_comment'::regclass
+              AND contype = 'f';
+            EXECUTE format('ALTER TABLE api_comment DROP CONSTRAINT %I', fk_name);
+            EXECUTE format(
+                'ALTER TABLE api_comment ADD CONSTRAINT %I FOREIGN KEY (parent_comment_id) '
+                'REFERENCES api_comment (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED',
+                fk_name
+            );
+        END $$;
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_comment_deleted_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_not_partitioned, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='comment',
+            name='external_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent_external_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(copy_ids_to_external_id, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='comment',
+            name='parent_comment',
+        ),
+        migrations.RunPython(renumber_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(reset_id_sequence, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='comment',
+            name='parent_comment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='api.comment'),
+        ),
+        migrations.RunPython(link_parents, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='comment',
+            name='parent_external_id',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='external_id',
+            field=models.TextField(default=api.models.new_external_id, unique=True),
+        ),
+        migrations.RunPython(cascade_parent_in_db, migrations.RunPython.noop),
+    ]
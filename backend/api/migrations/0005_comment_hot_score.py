@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:33
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_scores(apps, schema_editor):
+    # same formula as comment_manager.hot_score, only comments inside its 7 day horizon score above 0
+    Comment = apps.get_model('api', 'Comment')
+    comments = Comment.objects.using(schema_editor.connection.alias)
+    reply_counts = (
+        comments.filter(deleted_date__isnull=True, parent_comment__isnull=False)
+        .order_by()
+        .values('parent_comment_id')
+        .annotate(n=models.Count('id'))
+    )
+    for row in reply_counts:
+        comments.filter(id=row['parent_comment_id']).update(reply_count=row['n'])
+
+    now = timezone.now()
+    recent = list(comments.filter(created_date__gte=now - datetime.timedelta(days=7)))
+    for comment in recent:
+        age_hours = max((now - comment.created_date).total_seconds() / 3600, 0)
+        comment.hot_score = (comment.likes + 2 * comment.reply_count + 1) / (age_hours + 2) ** 1.5
+    comments.bulk_update(recent, ['hot_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_comment_bigint_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_date__isnull', True)), fields=['-hot_score'], name='comment_hot_score_idx'),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
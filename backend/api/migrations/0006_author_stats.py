@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_author_stats(apps, schema_editor):
+    Comment = apps.get_model('api', 'Comment')
+    AuthorStats = apps.get_model('api', 'AuthorStats')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        Comment.objects.using(db_alias).filter(deleted_date__isnull=True)
+        .order_by()
+        .values('author_id')
+        .annotate(
+            comment_count=models.Count('id'),
+            total_likes=models.Sum('likes'),
+            last_activity_date=models.Max('created_date')
+        )
+    )
+    AuthorStats.objects.using(db_alias).bulk_create([
+        AuthorStats(
+            person_id=row['author_id'],
+            comment_count=row['comment_count'],
+            total_likes=row['total_likes'] or 0,
+            last_activity_date=row['last_activity_date']
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_comment_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.person')),
+                ('comment_count', models.IntegerField(default=0)),
+                ('total_likes', models.IntegerField(default=0)),
+                ('last_activity_date', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_date__isnull', True)), fields=['author', '-created_date'], name='comment_author_feed_idx'),
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_author_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_date'], name='comment_created_date_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_comment_created_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.TextField(unique=True)),
+                ('inode', models.BigIntegerField(null=True)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
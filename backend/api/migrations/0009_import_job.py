@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:38
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.TextField(db_index=True, default='queued')),
+                ('format', models.TextField(default='ndjson')),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('bytes_processed', models.BigIntegerField(default=0)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('started_date', models.DateTimeField(null=True)),
+                ('finished_date', models.DateTimeField(null=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+def create_notify_trigger(apps, schema_editor):
+    # feeds api.thread_index, each worker's listener applies these to its in-memory copy of the tree
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        CREATE OR REPLACE FUNCTION comment_tree_notify() RETURNS trigger AS $$
+        DECLARE
+            changed api_comment%ROWTYPE;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := OLD;
+            ELSE
+                changed := NEW;
+            END IF;
+            IF TG_OP = 'UPDATE'
+               AND NEW.parent_comment_id IS NOT DISTINCT FROM OLD.parent_comment_id
+               AND (NEW.deleted_date IS NULL) = (OLD.deleted_date IS NULL) THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('comment_tree', concat_ws(',',
+                changed.id,
+                coalesce(changed.parent_comment_id::text, ''),
+                CASE WHEN TG_OP = 'DELETE' OR changed.deleted_date IS NOT NULL THEN '1' ELSE '0' END
+            ));
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+    """)
+    schema_editor.execute("""
+        CREATE TRIGGER comment_tree_notify
+        AFTER INSERT OR DELETE OR UPDATE OF parent_comment_id, deleted_date ON api_comment
+        FOR EACH ROW EXECUTE FUNCTION comment_tree_notify()
+    """)
+
+
+def drop_notify_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS comment_tree_notify ON api_comment")
+    schema_editor.execute("DROP FUNCTION IF EXISTS comment_tree_notify()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_import_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_notify_trigger, drop_notify_trigger),
+    ]
@@ -0,0 +1,38 @@
+import datetime
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+from django.utils import timezone
+
+
+def freeze_old_scores(apps, schema_editor):
+    # same as comment_manager.hot_score past its 7 day horizon, one set based update since the
+    # denominator is the same for every row
+    Comment = apps.get_model('api', 'Comment')
+    horizon = datetime.timedelta(days=7)
+    frozen_divisor = (horizon.total_seconds() / 3600 + 2) ** 1.5
+    Comment.objects.using(schema_editor.connection.alias).filter(created_date__lt=timezone.now() - horizon).update(
+        hot_score=ExpressionWrapper(
+            (F('likes') + 2 * F('reply_count') + 1) / frozen_divisor,
+            output_field=models.FloatField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_comment_tree_notify'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_hot_score_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_date__isnull', True)), fields=['-hot_score', '-created_date'], name='comment_hot_score_idx'),
+        ),
+        migrations.RunPython(freeze_old_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_freeze_hot_scores'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_author_feed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_date__isnull', True)), fields=['author', '-created_date', '-id'], name='comment_author_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_author_feed_tiebreak'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingParentLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.TextField(unique=True)),
+                ('parent_external_id', models.TextField(db_index=True)),
+            ],
+        ),
+    ]
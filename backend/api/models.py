@@ -1,6 +1,9 @@
 import uuid
+from pathlib import Path
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Person(models.Model):
@@ -8,8 +11,21 @@ class Person(models.Model):
     name = models.TextField(db_index=True)
 
 
+def new_external_id() -> str:
+    return str(uuid.uuid4())
+
+
+class CommentManager(models.Manager):
+    """Default manager for Comment, hides soft-deleted comments that are waiting on the purge"""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_date__isnull=True)
+
+
 class Comment(models.Model):
-    id = models.TextField(primary_key=True)
+    id = models.BigAutoField(primary_key=True)
+    # the id comments are known by outside this db, imports are idempotent on it
+    external_id = models.TextField(unique=True, default=new_external_id)
     parent_comment = models.ForeignKey('Comment', null=True, on_delete=models.CASCADE)
     author = models.ForeignKey(Person, on_delete=models.CASCADE)
     text = models.TextField()
@@ -17,24 +33,165 @@ class Comment(models.Model):
     updated_date = models.DateTimeField()
     likes = models.IntegerField(default=0)
     image = models.URLField(max_length=500, blank=True)
+    deleted_date = models.DateTimeField(null=True, blank=True)
+    reply_count = models.IntegerField(default=0)
+    # popularity that decays with age, kept current by comment_manager.refresh_hot_scores
+    hot_score = models.FloatField(default=0)
     
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "parent_comment_id": self.parent_comment_id,
-            "author": {
+    objects = CommentManager()
+    all_objects = models.Manager()
+    
+    # to_dict key -> the model fields it reads, so list queries can load only what they return
+    DICT_FIELDS = {
+        "external_id": ["external_id"],
+        "author": ["author__id", "author__name"],
+        "text": ["text"],
+        "created_date": ["created_date"],
+        "updated_date": ["updated_date"],
+        "likes": ["likes"],
+        "reply_count": ["reply_count"],
+        "image": ["image"],
+    }
+    
+    def to_dict(self, fields=None):
+        """fields narrows the result to those keys of DICT_FIELDS, id and parent_comment_id are always included"""
+        getters = {
+            "external_id": lambda: self.external_id,
+            "author": lambda: {
                 "id": str(self.author.id),
                 "name": self.author.name
             },
-            "text": self.text,
-            "created_date": self.created_date.isoformat(),
-            "updated_date": self.updated_date.isoformat(),
-            "likes": self.likes,
-            "image": self.image
+            "text": lambda: self.text,
+            "created_date": lambda: self.created_date.isoformat(),
+            "updated_date": lambda: self.updated_date.isoformat(),
+            "likes": lambda: self.likes,
+            "reply_count": lambda: self.reply_count,
+            "image": lambda: self.image
         }
+        
+        d = {
+            "id": self.id,
+            "parent_comment_id": self.parent_comment_id
+        }
+        for name, getter in getters.items():
+            if fields is None or name in fields:
+                d[name] = getter()
+        return d
     
     class Meta:
         ordering = ['-created_date']
+        indexes = [
+            # only soft-deleted rows land in here, so the purge can find its work cheaply
+            models.Index(
+                fields=['deleted_date'],
+                condition=models.Q(deleted_date__isnull=False),
+                name='comment_pending_purge_idx'
+            ),
+            # time range scans, the list sort and export_comments
+            models.Index(fields=['-created_date'], name='comment_created_date_idx'),
+            # the per author feed, newest first
+            models.Index(
+                fields=['author', '-created_date', '-id'],
+                condition=models.Q(deleted_date__isnull=True),
+                name='comment_author_feed_idx'
+            ),
+            # serves sort=top without sorting at read time
+            models.Index(
+                fields=['-hot_score', '-created_date'],
+                condition=models.Q(deleted_date__isnull=True),
+                name='comment_hot_score_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.author_id}: {self.text[:50]}..."
+
+
+class AuthorStats(models.Model):
+    """Per person comment totals, delta updated by comment_manager.  rebuild_author_stats repairs them"""
+    person = models.OneToOneField(Person, primary_key=True, on_delete=models.CASCADE, related_name='stats')
+    comment_count = models.IntegerField(default=0)
+    total_likes = models.IntegerField(default=0)
+    # created_date of the person's newest comment
+    last_activity_date = models.DateTimeField(null=True)
+    
+    def to_dict(self):
+        return {
+            "comment_count": self.comment_count,
+            "total_likes": self.total_likes,
+            "last_activity_date": self.last_activity_date.isoformat() if self.last_activity_date else None
+        }
+
+
+class ImportCheckpoint(models.Model):
+    """How far import_comments --follow has read a file, saved in the same transaction as the rows it covers"""
+    path = models.TextField(unique=True)
+    # lets the follower spot a rotated file and find where the old one went
+    inode = models.BigIntegerField(null=True)
+    offset = models.BigIntegerField(default=0)
+    updated_date = models.DateTimeField(auto_now=True)
+
+
+class PendingParentLink(models.Model):
+    """A reply ingested before its parent, stored as top level until a later batch brings the parent"""
+    # external ids, the parent has no row to point at yet
+    external_id = models.TextField(unique=True)
+    parent_external_id = models.TextField(db_index=True)
+
+
+class ImportJob(models.Model):
+    """A comment file uploaded over http and ingested in the background by run_import_worker"""
+    UPLOADING = "uploading"
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    
+    # only the most recent errors are kept on the job, the worker log has all of them
+    MAX_ERRORS = 100
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.TextField(default=QUEUED, db_index=True)
+    format = models.TextField(default="ndjson")
+    total_bytes = models.BigIntegerField(default=0)
+    bytes_processed = models.BigIntegerField(default=0)
+    rows_processed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    created_date = models.DateTimeField(auto_now_add=True)
+    started_date = models.DateTimeField(null=True)
+    finished_date = models.DateTimeField(null=True)
+    # doubles as the worker heartbeat, every batch saves the job
+    updated_date = models.DateTimeField(auto_now=True)
+    
+    def upload_path(self) -> Path:
+        return Path(settings.IMPORT_JOB_DIR) / f"{self.id}.{self.format}"
+    
+    def ingest_path(self) -> Path:
+        """The worker always reads ndjson, json uploads are converted next to the upload first"""
+        return Path(settings.IMPORT_JOB_DIR) / f"{self.id}.ndjson"
+    
+    def to_dict(self):
+        rate = None
+        eta_seconds = None
+        if self.started_date and self.bytes_processed:
+            elapsed = ((self.finished_date or timezone.now()) - self.started_date).total_seconds()
+            if elapsed > 0:
+                rate = self.rows_processed / elapsed
+                if self.status == self.RUNNING and self.total_bytes:
+                    bytes_per_second = self.bytes_processed / elapsed
+                    eta_seconds = (self.total_bytes - self.bytes_processed) / bytes_per_second
+        
+        return {
+            "id": str(self.id),
+            "status": self.status,
+            "format": self.format,
+            "rows_processed": self.rows_processed,
+            "bytes_processed": self.bytes_processed,
+            "total_bytes": self.total_bytes,
+            "rows_per_second": rate,
+            "eta_seconds": eta_seconds,
+            "errors": self.errors,
+            "created_date": self.created_date.isoformat(),
+            "started_date": self.started_date.isoformat() if self.started_date else None,
+            "finished_date": self.finished_date.isoformat() if self.finished_date else None
+        }
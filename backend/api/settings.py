@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import pprint
 from pathlib import Path
 import os
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.db_router.ReplicaPinningMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,62 @@ DATABASES = {
     }
 }
 
+# Read replicas, DB_REPLICAS is a comma separated list of db names (file paths with a sqlite
+# DB_REPLICA_ENGINE).  Read-only requests are routed to them by api.db_router, everything else
+# uses default.
+DATABASE_REPLICAS = []
+DB_REPLICA_ENGINE = os.getenv('DB_REPLICA_ENGINE', 'django.db.backends.postgresql')
+for replica_number, replica_name in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica_{replica_number}'
+    DATABASES[alias] = {
+        'ENGINE': DB_REPLICA_ENGINE,
+        'NAME': replica_name.strip(),
+        'HOST': os.getenv('DB_REPLICA_HOST', 'localhost'),
+        'PORT': '5432',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+# Connection reuse.  DB_POOL_MAX_SIZE > 0 turns on psycopg's connection pool, otherwise each
+# worker keeps its connection for DB_CONN_MAX_AGE seconds.  Either way connections are health
+# checked before they are handed out.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '0'))
+for database in DATABASES.values():
+    database['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL_MAX_SIZE and database['ENGINE'] == 'django.db.backends.postgresql':
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            },
+        }
+    else:
+        database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# how long a client keeps reading from default after it writes
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '2'))
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv('REPLICA_HEALTH_CHECK_SECONDS', '5'))
+
+
+# Uploaded files for http import jobs, see api.import_jobs
+IMPORT_JOB_DIR = Path(os.getenv('IMPORT_JOB_DIR', BASE_DIR.parent / 'data' / 'import_jobs'))
+
+
+# Per worker in-memory comment tree kept current by postgres notifications, see api.thread_index.
+# THREAD_INDEX_MAX_COMMENTS bounds it, past that it switches itself off.  It costs 40 bytes a comment
+# and about 90 while a resync builds the new tree next to the old one, so the default of 2M comments
+# is 80MB per worker and up to ~180MB during a resync.
+THREAD_INDEX_ENABLED = os.getenv('THREAD_INDEX_ENABLED', '0') == '1'
+THREAD_INDEX_MAX_COMMENTS = int(os.getenv('THREAD_INDEX_MAX_COMMENTS', '2000000'))
+THREAD_INDEX_RESYNC_SECONDS = float(os.getenv('THREAD_INDEX_RESYNC_SECONDS', '600'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -167,3 +225,7 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# the ui is cross site, read your writes for it goes through this header rather than the pin cookie
+CORS_ALLOW_HEADERS = (*default_headers, "x-pin-primary-until")
+CORS_EXPOSE_HEADERS = ["X-Pin-Primary-Until"]
+
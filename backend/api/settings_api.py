@@ -0,0 +1,30 @@
+"""
+Settings for the processes that serve the JSON API, `DJANGO_SETTINGS_MODULE=api.settings_api`.
+
+Everything comes from api.settings, minus the apps and middleware the comment endpoints never
+touch: there is no admin, no login (fetch_current_user is hard-coded), no sessions, no messages
+and no html, so none of it is imported, and none of it runs on every request.  Migrations,
+management commands and the dev server keep using api.settings.  Compare the two with
+`manage.py bench_settings_profiles`.
+"""
+from api.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'corsheaders',
+    'api.apps.ApiConfig',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'api.db_router.ReplicaPinningMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+# responses are all JsonResponse
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
+
+# no translated strings in the api, skips loading the translation catalogs
+USE_I18N = False
@@ -0,0 +1,16 @@
+"""
+Settings for the test suite, `python manage.py test --settings=api.settings_test` (dev_scripts/run_tests.sh).
+
+Everything comes from api.settings plus a sqlite database standing in for a read replica, so the
+router tests can send a read to a second database.  It isn't in DATABASE_REPLICAS, the runner
+creates and migrates it like any other test database and the tests that use it turn it into a
+replica with override_settings.
+"""
+from api.settings import *  # noqa: F401,F403
+
+SQLITE_REPLICA = 'replica_sqlite'
+
+DATABASES[SQLITE_REPLICA] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': ':memory:',
+}
@@ -0,0 +1,160 @@
+import json
+import tempfile
+from pathlib import Path
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from api.comment_manager import import_comments, purge_deleted_comments, rebuild_author_stats
+from api.models import AuthorStats, Comment, Person
+
+
+class AuthorStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = Person.objects.create(name="Admin")
+
+    def _post_comment(self, text, parent_comment_id=None):
+        response = self.client.post(
+            reverse('upsert_comment'),
+            data=json.dumps({"text": text, "parent_comment_id": parent_comment_id}),
+            content_type='application/json'
+        )
+        return response.json()
+
+    def _stats(self, person):
+        return AuthorStats.objects.get(person=person)
+
+    def test_stats_follow_create_like_and_delete(self):
+        first = self._post_comment("first")
+        second = self._post_comment("second")
+        self.client.post(reverse('like_comment', kwargs={'comment_id': first['id']}))
+        self.client.post(reverse('like_comment', kwargs={'comment_id': first['id']}))
+
+        stats = self._stats(self.admin)
+        self.assertEqual(stats.comment_count, 2)
+        self.assertEqual(stats.total_likes, 2)
+        self.assertEqual(stats.last_activity_date.isoformat(), second['created_date'])
+
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': first['id']}))
+
+        stats = self._stats(self.admin)
+        self.assertEqual(stats.comment_count, 1)
+        self.assertEqual(stats.total_likes, 0)
+
+    def test_purge_removes_hidden_replies_from_stats(self):
+        root = self._post_comment("root")
+        self._post_comment("reply", parent_comment_id=root['id'])
+
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': root['id']}))
+        purge_deleted_comments()
+
+        self.assertEqual(self._stats(self.admin).comment_count, 0)
+
+    def test_import_and_rebuild_match(self):
+        data = {
+            "comments": [
+                {"id": "1", "author": "Alice", "text": "one", "date": "2023-01-01T10:00:00Z", "likes": 3, "image": ""},
+                {"id": "2", "author": "Alice", "text": "two", "date": "2023-01-02T10:00:00Z", "likes": 4, "image": ""},
+                {"id": "3", "author": "Bob", "text": "three", "date": "2023-01-03T10:00:00Z", "likes": 1, "image": ""},
+            ]
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+            temp_file_path = Path(f.name)
+
+        import_comments(temp_file_path)
+        import_comments(temp_file_path)
+
+        alice = self._stats(Person.objects.get(name="Alice"))
+        self.assertEqual((alice.comment_count, alice.total_likes), (2, 7))
+        self.assertEqual(alice.last_activity_date.isoformat(), "2023-01-02T10:00:00+00:00")
+
+        AuthorStats.objects.update(comment_count=0, total_likes=0)
+        rebuild_author_stats()
+        alice = self._stats(Person.objects.get(name="Alice"))
+        self.assertEqual((alice.comment_count, alice.total_likes), (2, 7))
+
+        temp_file_path.unlink()
+
+    def test_import_applies_deltas_for_changed_rows(self):
+        first = {"comments": [
+            {"id": "1", "author": "Alice", "text": "one", "date": "2023-01-01T10:00:00Z", "likes": 3, "image": ""},
+            {"id": "2", "author": "Alice", "text": "two", "date": "2023-01-02T10:00:00Z", "likes": 4, "image": ""},
+        ]}
+        # likes change on 1, 2 moves to Bob, 3 is new
+        second = {"comments": [
+            {"id": "1", "author": "Alice", "text": "one", "date": "2023-01-01T10:00:00Z", "likes": 10, "image": ""},
+            {"id": "2", "author": "Bob", "text": "two", "date": "2023-01-02T10:00:00Z", "likes": 4, "image": ""},
+            {"id": "3", "author": "Bob", "text": "three", "date": "2023-01-03T10:00:00Z", "likes": 1, "image": ""},
+        ]}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name, data in [("first.json", first), ("second.json", second)]:
+                with open(Path(temp_dir) / name, "w") as f:
+                    json.dump(data, f)
+                import_comments(Path(temp_dir) / name)
+
+        alice = self._stats(Person.objects.get(name="Alice"))
+        bob = self._stats(Person.objects.get(name="Bob"))
+        self.assertEqual((alice.comment_count, alice.total_likes), (1, 10))
+        self.assertEqual((bob.comment_count, bob.total_likes), (2, 5))
+        self.assertEqual(bob.last_activity_date.isoformat(), "2023-01-03T10:00:00+00:00")
+
+        rebuild_author_stats()
+        self.assertEqual((self._stats(Person.objects.get(name="Alice")).comment_count,
+                          self._stats(Person.objects.get(name="Bob")).total_likes), (1, 5))
+
+    def test_author_feed_pages_newest_first(self):
+        for i in range(3):
+            Comment.objects.create(
+                author=self.admin,
+                text=f"comment {i}",
+                created_date=timezone.now() - timezone.timedelta(hours=3 - i),
+                updated_date=timezone.now()
+            )
+        rebuild_author_stats()
+
+        url = reverse('get_author_comments', kwargs={'author_id': self.admin.id})
+        page = self.client.get(url, {"limit": 2}).json()
+
+        self.assertEqual(page['author']['comment_count'], 3)
+        self.assertEqual([c['text'] for c in page['comments']], ["comment 2", "comment 1"])
+
+        next_page = self.client.get(url, {"limit": 2, "before": page['comments'][-1]['created_date']}).json()
+        self.assertEqual([c['text'] for c in next_page['comments']], ["comment 0"])
+
+    def test_author_feed_pages_through_equal_dates(self):
+        created_date = timezone.now()
+        for i in range(3):
+            Comment.objects.create(author=self.admin, text=f"comment {i}", created_date=created_date, updated_date=created_date)
+
+        url = reverse('get_author_comments', kwargs={'author_id': self.admin.id})
+        texts = []
+        params = {"limit": 2}
+        while True:
+            page = self.client.get(url, params).json()
+            texts.extend(c['text'] for c in page['comments'])
+            if not page['next']:
+                break
+            params = {"limit": 2, **page['next']}
+
+        self.assertEqual(texts, ["comment 2", "comment 1", "comment 0"])
+
+    def test_author_feed_bad_params(self):
+        Comment.objects.create(author=self.admin, text="only", created_date=timezone.now(), updated_date=timezone.now())
+        url = reverse('get_author_comments', kwargs={'author_id': self.admin.id})
+
+        response = self.client.get(url, {"limit": -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['comments']), 1)
+
+        response = self.client.get(url, {"before": "2024-13-45T00:00:00"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_author_feed_does_not_write(self):
+        url = reverse('get_author_comments', kwargs={'author_id': self.admin.id})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.json()['author']['comment_count'], 0)
+        self.assertFalse(AuthorStats.objects.filter(person=self.admin).exists())
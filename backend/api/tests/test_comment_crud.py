@@ -17,7 +17,6 @@ class CommentCRUDTestCase(TestCase):
         )
 
         self.existing_comment = Comment.objects.create(
-            id=str(uuid.uuid4()),
             author=self.test_person,
             text="Existing test comment",
             created_date=timezone.now(),
@@ -55,7 +54,6 @@ class CommentCRUDTestCase(TestCase):
     def test_get_all_comments_ordering(self):
         """Test that comments are returned in reverse chronological order"""
         older_comment = Comment.objects.create(
-            id=str(uuid.uuid4()),
             author=self.test_person,
             text="Older comment",
             created_date=timezone.now() - timezone.timedelta(hours=1),
@@ -65,7 +63,6 @@ class CommentCRUDTestCase(TestCase):
         )
 
         newer_comment = Comment.objects.create(
-            id=str(uuid.uuid4()),
             author=self.test_person,
             text="Newer comment",
             created_date=timezone.now(),
@@ -217,14 +214,14 @@ class CommentCRUDTestCase(TestCase):
         data = response.json()
 
         self.assertIn('message', data)
-        self.assertIn(comment_id, data['message'])
+        self.assertIn(str(comment_id), data['message'])
 
         self.assertEqual(Comment.objects.count(), initial_count - 1)
         self.assertFalse(Comment.objects.filter(id=comment_id).exists())
 
     def test_delete_comment_nonexistent(self):
         """Test deleting a comment that doesn't exist returns 404"""
-        fake_id = str(uuid.uuid4())
+        fake_id = self.existing_comment.id + 1000
 
         response = self.client.post(
             reverse('delete_comment', kwargs={'comment_id': fake_id})
@@ -272,3 +269,76 @@ class CommentCRUDTestCase(TestCase):
         self.assertEqual(delete_response.status_code, 200)
 
         self.assertFalse(Comment.objects.filter(id=comment_id).exists())
+
+    def test_get_all_comments_since(self):
+        """Test that since limits the list to recent comments"""
+        Comment.objects.create(
+            author=self.test_person,
+            text="Old comment",
+            created_date=timezone.now() - timezone.timedelta(days=60),
+            updated_date=timezone.now(),
+            likes=0,
+            image=""
+        )
+
+        since = (timezone.now() - timezone.timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('get_all_comments'), {"since": since})
+
+        self.assertEqual(response.status_code, 200)
+        texts = [c['text'] for c in response.json()['comments']]
+        self.assertEqual(texts, ["Existing test comment"])
+
+    def test_get_all_comments_since_keeps_old_threads_of_new_replies(self):
+        """Test that a new reply under a comment older than since comes back with its ancestors"""
+        old_root = Comment.objects.create(
+            author=self.test_person,
+            text="Old root",
+            created_date=timezone.now() - timezone.timedelta(days=30),
+            updated_date=timezone.now()
+        )
+        old_reply = Comment.objects.create(
+            parent_comment=old_root,
+            author=self.test_person,
+            text="Old reply",
+            created_date=timezone.now() - timezone.timedelta(days=29),
+            updated_date=timezone.now()
+        )
+        Comment.objects.create(
+            parent_comment=old_reply,
+            author=self.test_person,
+            text="New reply",
+            created_date=timezone.now(),
+            updated_date=timezone.now()
+        )
+
+        since = (timezone.now() - timezone.timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('get_all_comments'), {"since": since})
+
+        texts = {c['text'] for c in response.json()['comments']}
+        self.assertEqual(texts, {"Existing test comment", "New reply", "Old reply", "Old root"})
+
+        # still pruned when the old thread was deleted
+        Comment.objects.filter(pk=old_root.pk).update(deleted_date=timezone.now())
+        response = self.client.get(reverse('get_all_comments'), {"since": since})
+
+        texts = {c['text'] for c in response.json()['comments']}
+        self.assertEqual(texts, {"Existing test comment"})
+
+    def test_get_all_comments_bad_since(self):
+        """Test that an unparseable since returns error"""
+        response = self.client.get(reverse('get_all_comments'), {"since": "yesterday"})
+
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('get_all_comments'), {"since": "2024-13-45T00:00:00"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_db_stats(self):
+        """Test that the metrics endpoint reports the default connection"""
+        response = self.client.get(reverse('get_db_stats'))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn('default', data['databases'])
+        self.assertIn('pooled', data['databases']['default'])
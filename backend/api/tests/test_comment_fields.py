@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from api.models import Comment, Person
+
+
+class CommentFieldsTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.test_person = Person.objects.create(name="Admin")
+
+        self.long_comment = Comment.objects.create(
+            author=self.test_person,
+            text="x" * 5000,
+            created_date=timezone.now(),
+            updated_date=timezone.now()
+        )
+        self.short_comment = Comment.objects.create(
+            author=self.test_person,
+            text="short",
+            created_date=timezone.now() - timezone.timedelta(hours=1),
+            updated_date=timezone.now()
+        )
+
+    def test_fields_narrows_response_and_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get_all_comments'), {"fields": "likes"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()['comments'][0]),
+            {"id", "parent_comment_id", "likes"}
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"text"', queries[0]['sql'])
+        self.assertNotIn('api_person', queries[0]['sql'])
+
+    def test_fields_unknown(self):
+        response = self.client.get(reverse('get_all_comments'), {"fields": "likes,password"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()['error'])
+
+    def test_preview_truncates_text(self):
+        response = self.client.get(reverse('get_all_comments'), {"preview": "10"})
+
+        self.assertEqual(response.status_code, 200)
+        long_comment, short_comment = response.json()['comments']
+        self.assertEqual(long_comment['text'], "x" * 10)
+        self.assertTrue(long_comment['text_truncated'])
+        self.assertEqual(short_comment['text'], "short")
+        self.assertFalse(short_comment['text_truncated'])
+        self.assertEqual(short_comment['author']['name'], "Admin")
+
+    def test_preview_invalid(self):
+        response = self.client.get(reverse('get_all_comments'), {"preview": "0"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_comment_returns_full_text(self):
+        response = self.client.get(reverse('get_comment', kwargs={'comment_id': self.long_comment.id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], "x" * 5000)
+
+    def test_get_comment_nonexistent(self):
+        response = self.client.get(reverse('get_comment', kwargs={'comment_id': self.long_comment.id + 1000}))
+
+        self.assertEqual(response.status_code, 404)
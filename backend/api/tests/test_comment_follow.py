@@ -0,0 +1,74 @@
+import json
+import tempfile
+from pathlib import Path
+from django.test import TestCase
+
+from api.comment_follow import ingest_appended
+from api.models import Comment, ImportCheckpoint
+
+
+def comment_line(comment_id, parent=""):
+    return json.dumps({
+        "id": comment_id,
+        "parent": parent,
+        "author": "Alice",
+        "text": f"comment {comment_id}",
+        "date": "2023-01-01T10:00:00Z",
+        "likes": 0,
+        "image": ""
+    }) + "\n"
+
+
+class CommentFollowTestCase(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.comment_file = Path(self.temp_dir.name) / "comments.ndjson"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _append(self, text):
+        with open(self.comment_file, "a") as f:
+            f.write(text)
+
+    def test_ingests_only_appended_lines(self):
+        self._append(comment_line("1") + comment_line("2", parent="1"))
+
+        self.assertEqual(ingest_appended(self.comment_file, batch_size=1), 2)
+        self.assertEqual(ingest_appended(self.comment_file), 0)
+
+        self._append(comment_line("3"))
+        self.assertEqual(ingest_appended(self.comment_file), 1)
+
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(Comment.objects.get(external_id="2").parent_comment.external_id, "1")
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.offset, self.comment_file.stat().st_size)
+
+    def test_waits_for_partial_line(self):
+        line = comment_line("1")
+        self._append(line[:20])
+
+        self.assertEqual(ingest_appended(self.comment_file), 0)
+
+        self._append(line[20:])
+        self.assertEqual(ingest_appended(self.comment_file), 1)
+
+    def test_skips_malformed_line(self):
+        self._append("not json\n" + comment_line("1"))
+
+        self.assertEqual(ingest_appended(self.comment_file), 1)
+
+    def test_rotation_finishes_old_file(self):
+        self._append(comment_line("1"))
+        ingest_appended(self.comment_file)
+
+        self._append(comment_line("2"))
+        self.comment_file.rename(self.comment_file.with_suffix(".ndjson.1"))
+        self._append(comment_line("3"))
+
+        self.assertEqual(ingest_appended(self.comment_file), 2)
+        self.assertEqual(
+            sorted(Comment.objects.values_list("external_id", flat=True)),
+            ["1", "2", "3"]
+        )
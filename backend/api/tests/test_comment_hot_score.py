@@ -0,0 +1,111 @@
+import json
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from api.comment_manager import decay_hot_scores, hot_score
+from api.models import Comment, Person
+
+
+class CommentHotScoreTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.test_person = Person.objects.create(name="Admin")
+
+        self.fresh = self._create_comment("fresh", hours_old=1)
+        self.popular = self._create_comment("popular", hours_old=5, likes=50)
+        self.stale = self._create_comment("stale", hours_old=24 * 30, likes=1000)
+
+    def _create_comment(self, text, hours_old, likes=0):
+        created_date = timezone.now() - timezone.timedelta(hours=hours_old)
+        return Comment.objects.create(
+            author=self.test_person,
+            text=text,
+            created_date=created_date,
+            updated_date=created_date,
+            likes=likes,
+            hot_score=hot_score(likes, 0, created_date)
+        )
+
+    def test_hot_score_decays_with_age(self):
+        now = timezone.now()
+
+        self.assertGreater(hot_score(10, 0, now - timezone.timedelta(hours=1), now),
+                           hot_score(10, 0, now - timezone.timedelta(hours=10), now))
+        self.assertGreater(hot_score(10, 1, now, now), hot_score(10, 0, now, now))
+
+    def test_hot_score_freezes_at_horizon(self):
+        now = timezone.now()
+        frozen = hot_score(10, 0, now - timezone.timedelta(days=8), now)
+
+        self.assertGreater(frozen, 0)
+        self.assertEqual(hot_score(10, 0, now - timezone.timedelta(days=300), now), frozen)
+        self.assertGreater(hot_score(1000, 0, now - timezone.timedelta(days=300), now), frozen)
+
+    def test_sort_top(self):
+        response = self.client.get(reverse('get_all_comments'), {"sort": "top"})
+
+        self.assertEqual(response.status_code, 200)
+        texts = [c['text'] for c in response.json()['comments']]
+        # stale's score froze at the horizon, its 1000 likes still beat an unliked hour old comment
+        self.assertEqual(texts, ["popular", "stale", "fresh"])
+
+    def test_sort_unknown(self):
+        response = self.client.get(reverse('get_all_comments'), {"sort": "random"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_like_updates_score(self):
+        before = self.fresh.hot_score
+
+        response = self.client.post(reverse('like_comment', kwargs={'comment_id': self.fresh.id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['likes'], 1)
+        self.fresh.refresh_from_db()
+        self.assertGreater(self.fresh.hot_score, before)
+
+    def test_like_needs_post(self):
+        response = self.client.get(reverse('like_comment', kwargs={'comment_id': self.fresh.id}))
+
+        self.assertEqual(response.status_code, 405)
+        self.fresh.refresh_from_db()
+        self.assertEqual(self.fresh.likes, 0)
+
+    def test_reply_and_delete_update_parent(self):
+        response = self.client.post(
+            reverse('upsert_comment'),
+            data=json.dumps({"text": "a reply", "parent_comment_id": self.fresh.id}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['parent_comment_id'], self.fresh.id)
+
+        self.fresh.refresh_from_db()
+        self.assertEqual(self.fresh.reply_count, 1)
+
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': response.json()['id']}))
+
+        self.fresh.refresh_from_db()
+        self.assertEqual(self.fresh.reply_count, 0)
+
+    def test_decay_skips_frozen_comments(self):
+        frozen = self.stale.hot_score
+        updated = decay_hot_scores()
+
+        self.assertEqual(updated, 2)
+        self.stale.refresh_from_db()
+        self.assertEqual(self.stale.hot_score, frozen)
+        self.assertGreater(frozen, 0)
+
+    def test_top_still_ranks_old_comments_by_likes(self):
+        old_unliked = self._create_comment("old unliked", hours_old=24 * 40)
+        # ties break on created_date, newest first
+        old_twin = self._create_comment("old twin", hours_old=24 * 35)
+
+        response = self.client.get(reverse('get_all_comments'), {"sort": "top"})
+
+        texts = [c['text'] for c in response.json()['comments']]
+        self.assertLess(texts.index("stale"), texts.index("old unliked"))
+        self.assertLess(texts.index("old twin"), texts.index("old unliked"))
+        self.assertEqual(old_twin.hot_score, old_unliked.hot_score)
@@ -1,11 +1,13 @@
+import datetime
 import json
 import tempfile
 from pathlib import Path
 from django.test import TestCase
 from django.utils import timezone
 
-from api.comment_manager import import_comments
-from api.models import Comment, Person
+from api.comment_manager import export_comments, import_comments, ingest_comments, read_comment_file
+from api.management.commands.export_comments import Command as ExportCommand
+from api.models import AuthorStats, Comment, PendingParentLink, Person
 
 
 class CommentImportTestCase(TestCase):
@@ -49,13 +51,13 @@ class CommentImportTestCase(TestCase):
         self.assertEqual(Comment.objects.count(), 3)
         self.assertEqual(Person.objects.count(), 3)
 
-        comment1 = Comment.objects.get(id="1")
+        comment1 = Comment.objects.get(external_id="1")
         self.assertEqual(comment1.text, "First test comment")
         self.assertEqual(comment1.author.name, "Alice")
         self.assertEqual(comment1.likes, 10)
         self.assertEqual(comment1.image, "https://example.com/image1.jpg")
 
-        comment2 = Comment.objects.get(id="2")
+        comment2 = Comment.objects.get(external_id="2")
         self.assertEqual(comment2.text, "Second test comment")
         self.assertEqual(comment2.author.name, "Bob")
         self.assertEqual(comment2.likes, 25)
@@ -82,7 +84,7 @@ class CommentImportTestCase(TestCase):
     def test_import_comments_with_reset(self):
         existing_person = Person.objects.create(name="ExistingUser")
         existing_comment = Comment.objects.create(
-            id="existing-1",
+            external_id="existing-1",
             author=existing_person,
             text="Existing comment",
             created_date=timezone.now(),
@@ -98,14 +100,14 @@ class CommentImportTestCase(TestCase):
         import_comments(temp_file_path, reset=True)
 
         self.assertEqual(Comment.objects.count(), 3)
-        self.assertFalse(Comment.objects.filter(id="existing-1").exists())
+        self.assertFalse(Comment.objects.filter(external_id="existing-1").exists())
 
         temp_file_path.unlink()
 
     def test_import_comments_without_reset(self):
         existing_person = Person.objects.create(name="ExistingUser")
         existing_comment = Comment.objects.create(
-            id="existing-1",
+            external_id="existing-1",
             author=existing_person,
             text="Existing comment",
             created_date=timezone.now(),
@@ -121,14 +123,14 @@ class CommentImportTestCase(TestCase):
         import_comments(temp_file_path, reset=False)
 
         self.assertEqual(Comment.objects.count(), 4)
-        self.assertTrue(Comment.objects.filter(id="existing-1").exists())
+        self.assertTrue(Comment.objects.filter(external_id="existing-1").exists())
 
         temp_file_path.unlink()
 
     def test_import_comments_update_existing(self):
         alice = Person.objects.create(name="Alice")
         Comment.objects.create(
-            id="1",
+            external_id="1",
             author=alice,
             text="Original text",
             created_date=timezone.now(),
@@ -145,7 +147,7 @@ class CommentImportTestCase(TestCase):
 
         self.assertEqual(Comment.objects.count(), 3)
 
-        comment1 = Comment.objects.get(id="1")
+        comment1 = Comment.objects.get(external_id="1")
         self.assertEqual(comment1.text, "First test comment")
         self.assertEqual(comment1.likes, 10)
 
@@ -206,3 +208,101 @@ class CommentImportTestCase(TestCase):
 
         temp_file_path.unlink()
         temp_file_path2.unlink()
+
+    def test_import_comments_links_parents(self):
+        threaded_data = {
+            "comments": [
+                {"id": "10", "parent": "9", "author": "Bob", "text": "reply", "date": "2023-01-02T11:00:00Z", "likes": 0, "image": ""},
+                {"id": "9", "parent": "", "author": "Alice", "text": "root", "date": "2023-01-01T10:00:00Z", "likes": 0, "image": ""},
+            ]
+        }
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(threaded_data, f)
+            temp_file_path = Path(f.name)
+
+        import_comments(temp_file_path)
+        import_comments(temp_file_path)
+
+        root = Comment.objects.get(external_id="9")
+        reply = Comment.objects.get(external_id="10")
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertIsNone(root.parent_comment_id)
+        self.assertEqual(reply.parent_comment_id, root.id)
+
+        temp_file_path.unlink()
+
+    def test_reply_before_its_parent_is_linked_by_a_later_batch(self):
+        ingest_comments([
+            {"id": "2", "parent": "1", "author": "Bob", "text": "reply", "date": "2023-01-02T11:00:00Z", "likes": 0, "image": ""},
+        ])
+        self.assertIsNone(Comment.objects.get(external_id="2").parent_comment_id)
+
+        ingest_comments([
+            {"id": "1", "parent": "", "author": "Alice", "text": "root", "date": "2023-01-01T10:00:00Z", "likes": 0, "image": ""},
+        ])
+
+        root = Comment.objects.get(external_id="1")
+        self.assertEqual(Comment.objects.get(external_id="2").parent_comment_id, root.id)
+        self.assertEqual(root.reply_count, 1)
+        self.assertFalse(PendingParentLink.objects.exists())
+
+    def test_export_round_trip(self):
+        threaded_data = {
+            "comments": [
+                {"id": "1", "parent": "", "author": "Alice", "text": "root", "date": "2023-01-01T10:00:00Z", "likes": 2, "image": ""},
+                {"id": "2", "parent": "1", "author": "Bob", "text": "reply", "date": "2023-01-02T11:00:00Z", "likes": 0, "image": "https://example.com/a.png"},
+            ]
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(threaded_data, f)
+            temp_file_path = Path(f.name)
+        import_comments(temp_file_path)
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            for export_file, fmt in [
+                (Path(export_dir) / "export.json", "json"),
+                (Path(export_dir) / "export.ndjson.gz", "ndjson"),
+            ]:
+                self.assertEqual(export_comments(export_file, fmt), 2)
+                self.assertEqual(read_comment_file(export_file), threaded_data["comments"])
+
+            import_comments(Path(export_dir) / "export.ndjson.gz", reset=True)
+
+        self.assertEqual(Comment.objects.count(), 2)
+        reply = Comment.objects.get(external_id="2")
+        self.assertEqual(reply.parent_comment.external_id, "1")
+
+        temp_file_path.unlink()
+
+    def test_export_leaves_out_deleted_threads(self):
+        threaded_data = {
+            "comments": [
+                {"id": "1", "parent": "", "author": "Alice", "text": "root", "date": "2023-01-01T10:00:00Z", "likes": 0, "image": ""},
+                {"id": "2", "parent": "1", "author": "Bob", "text": "reply", "date": "2023-01-02T11:00:00Z", "likes": 0, "image": ""},
+                {"id": "3", "parent": "2", "author": "Bob", "text": "nested", "date": "2023-01-03T11:00:00Z", "likes": 0, "image": ""},
+                {"id": "4", "parent": "", "author": "Alice", "text": "other", "date": "2023-01-04T10:00:00Z", "likes": 0, "image": ""},
+            ]
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(threaded_data, f)
+            temp_file_path = Path(f.name)
+        import_comments(temp_file_path)
+        Comment.objects.filter(external_id="1").update(deleted_date=timezone.now())
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            export_file = Path(export_dir) / "export.ndjson"
+            self.assertEqual(export_comments(export_file, "ndjson"), 1)
+            self.assertEqual([c["id"] for c in read_comment_file(export_file)], ["4"])
+
+        # a read only dump, marking the replies is left to the purge
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(AuthorStats.objects.get(person__name="Bob").comment_count, 2)
+
+        temp_file_path.unlink()
+
+    def test_export_command_makes_naive_dates_aware(self):
+        since = ExportCommand().parse_date("2023-01-01T00:00:00")
+
+        self.assertTrue(timezone.is_aware(since))
+        self.assertEqual(since, timezone.make_aware(datetime.datetime(2023, 1, 1)))
@@ -0,0 +1,74 @@
+import datetime
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import comment_manager, comment_partitions
+from api.models import AuthorStats, Comment, Person
+
+
+class CommentPartitionsTestCase(TestCase):
+    def test_month_start_normalizes_to_utc(self):
+        d = datetime.datetime(2024, 3, 1, 1, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=5)))
+
+        self.assertEqual(
+            comment_partitions.month_start(d),
+            datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+        )
+
+    def test_add_months_crosses_years(self):
+        d = datetime.datetime(2024, 11, 1, tzinfo=datetime.timezone.utc)
+
+        self.assertEqual(comment_partitions.add_months(d, 3), datetime.datetime(2025, 2, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(comment_partitions.add_months(d, -11), datetime.datetime(2023, 12, 1, tzinfo=datetime.timezone.utc))
+
+    def test_partition_name(self):
+        d = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+        self.assertEqual(comment_partitions.partition_name(d), "api_comment_p2025_01")
+
+    def test_unpartitioned_table_is_left_alone(self):
+        self.assertFalse(comment_partitions.is_partitioned())
+        self.assertEqual(
+            comment_partitions.ensure_partitions_for_dates([datetime.datetime.now(datetime.timezone.utc)]),
+            []
+        )
+
+    def _create(self, person, parent=None, created_date=None):
+        return Comment.objects.create(
+            parent_comment=parent,
+            author=person,
+            text="text",
+            likes=2,
+            created_date=created_date or timezone.now(),
+            updated_date=timezone.now()
+        )
+
+    def test_thread_lookups_are_bounded_by_created_date(self):
+        person = Person.objects.create(name="Admin")
+        root = self._create(person, created_date=timezone.now() - datetime.timedelta(days=40))
+        reply = self._create(person, root)
+        nested_reply = self._create(person, reply)
+
+        with CaptureQueriesContext(connection) as queries:
+            thread = comment_manager.comment_thread(root)
+            ancestors = comment_manager.add_missing_ancestors([nested_reply], Comment.objects.all())
+
+        self.assertEqual(thread["replies"][0]["replies"][0]["id"], nested_reply.id)
+        self.assertEqual({c.id for c in ancestors}, {root.id, reply.id, nested_reply.id})
+        thread_query, ancestor_query = queries.captured_queries[0]["sql"], queries.captured_queries[-1]["sql"]
+        self.assertRegex(thread_query, r'"created_date" >= ')
+        self.assertRegex(ancestor_query, r'"created_date" <= ')
+
+    def test_forget_archived_comments(self):
+        person = Person.objects.create(name="Admin")
+        root = self._create(person)
+        Comment.objects.filter(pk=root.pk).update(reply_count=2)
+        comment_manager.record_author_activity(person.id, comments=3, likes=6)
+
+        comment_manager.forget_archived_comments([(person.id, 2, 4)], [(root.id, 2)])
+
+        stats = AuthorStats.objects.get(person=person)
+        self.assertEqual((stats.comment_count, stats.total_likes), (1, 2))
+        self.assertEqual(Comment.objects.get(pk=root.pk).reply_count, 0)
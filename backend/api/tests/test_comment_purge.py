@@ -0,0 +1,98 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from api.comment_manager import purge_deleted_comments
+from api.models import Comment, Person
+
+
+class CommentPurgeTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.test_person = Person.objects.create(name="Admin")
+
+        self.root = self._create_comment("root")
+        self.reply = self._create_comment("reply", parent=self.root)
+        self.nested_reply = self._create_comment("nested reply", parent=self.reply)
+        self.other = self._create_comment("other thread")
+
+    def _create_comment(self, text, parent=None):
+        return Comment.objects.create(
+            parent_comment=parent,
+            author=self.test_person,
+            text=text,
+            created_date=timezone.now(),
+            updated_date=timezone.now()
+        )
+
+    def test_delete_hides_whole_thread(self):
+        response = self.client.post(
+            reverse('delete_comment', kwargs={'comment_id': self.root.id})
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse('get_all_comments'))
+        ids = [c['id'] for c in response.json()['comments']]
+        self.assertEqual(ids, [self.other.id])
+
+        # nothing is hard deleted until the purge runs
+        self.assertEqual(Comment.all_objects.count(), 4)
+        self.assertTrue(Comment.all_objects.get(id=self.root.id).deleted_date)
+
+    def test_replies_of_deleted_comment_are_not_readable(self):
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': self.root.id}))
+
+        for reply in (self.reply, self.nested_reply):
+            kwargs = {'comment_id': reply.id}
+            self.assertEqual(self.client.get(reverse('get_comment', kwargs=kwargs)).status_code, 404)
+            self.assertEqual(self.client.get(reverse('get_comment_thread', kwargs=kwargs)).status_code, 404)
+            self.assertEqual(self.client.post(reverse('like_comment', kwargs=kwargs)).status_code, 404)
+            response = self.client.post(
+                reverse('upsert_comment'),
+                data={"text": "late reply", "parent_comment_id": reply.id},
+                content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(reverse('get_author_comments', kwargs={'author_id': self.test_person.id}))
+        self.assertEqual([c['id'] for c in response.json()['comments']], [self.other.id])
+
+    def test_author_feed_fills_page_past_hidden_replies(self):
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': self.root.id}))
+        older = self._create_comment("older")
+        Comment.objects.filter(pk=older.pk).update(created_date=self.root.created_date)
+
+        response = self.client.get(
+            reverse('get_author_comments', kwargs={'author_id': self.test_person.id}), {"limit": 2}
+        )
+
+        self.assertEqual([c['id'] for c in response.json()['comments']], [self.other.id, older.id])
+
+    def test_delete_already_deleted_returns_404(self):
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': self.root.id}))
+
+        response = self.client.post(
+            reverse('delete_comment', kwargs={'comment_id': self.root.id})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_purge_removes_thread_in_batches(self):
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': self.root.id}))
+
+        purged = purge_deleted_comments(batch_size=1)
+
+        self.assertEqual(purged, 3)
+        self.assertEqual(list(Comment.all_objects.values_list('id', flat=True)), [self.other.id])
+
+    def test_purge_deleted_reply_keeps_parent(self):
+        self.client.post(reverse('delete_comment', kwargs={'comment_id': self.reply.id}))
+
+        purged = purge_deleted_comments()
+
+        self.assertEqual(purged, 2)
+        self.assertTrue(Comment.objects.filter(id=self.root.id).exists())
+        self.assertFalse(Comment.all_objects.filter(id=self.nested_reply.id).exists())
+
+    def test_purge_with_nothing_deleted(self):
+        self.assertEqual(purge_deleted_comments(), 0)
+        self.assertEqual(Comment.objects.count(), 4)
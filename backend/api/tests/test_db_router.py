@@ -0,0 +1,143 @@
+import time
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import db_router
+from api.models import Comment, Person
+
+# the sqlite stand in for a replica that api.settings_test adds
+SQLITE_REPLICA = 'replica_sqlite'
+HAS_SQLITE_REPLICA = SQLITE_REPLICA in settings.DATABASES
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = db_router.ReplicaRouter()
+        db_router._replica_health.clear()
+
+    def _read_db_for(self, request):
+        seen = {}
+
+        def view(request):
+            seen['db'] = self.router.db_for_read(Comment)
+            return HttpResponse()
+
+        response = db_router.ReplicaPinningMiddleware(view)(request)
+        return seen['db'], response
+
+    def test_reads_outside_requests_use_default(self):
+        self.assertIsNone(self.router.db_for_read(Comment))
+        self.assertEqual(self.router.db_for_write(Comment), 'default')
+
+    def test_get_reads_from_healthy_replica(self):
+        with mock.patch.object(db_router, 'replica_is_healthy', return_value=True):
+            db, response = self._read_db_for(self.factory.get('/api/v1/comments/'))
+
+        self.assertEqual(db, 'replica_1')
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+
+    def test_get_falls_back_when_replica_unhealthy(self):
+        with mock.patch.object(db_router, 'replica_is_healthy', return_value=False):
+            db, _ = self._read_db_for(self.factory.get('/api/v1/comments/'))
+
+        self.assertEqual(db, 'default')
+
+    def test_write_pins_client_to_default(self):
+        with mock.patch.object(db_router, 'replica_is_healthy', return_value=True):
+            db, response = self._read_db_for(self.factory.post('/api/v1/comments/upsert/'))
+
+            self.assertIsNone(db)
+            self.assertIn(db_router.PIN_COOKIE, response.cookies)
+
+            request = self.factory.get('/api/v1/comments/')
+            request.COOKIES[db_router.PIN_COOKIE] = "1"
+            db, _ = self._read_db_for(request)
+
+        self.assertIsNone(db)
+
+    def test_write_returns_pin_header_that_keeps_reads_on_default(self):
+        with mock.patch.object(db_router, 'replica_is_healthy', return_value=True):
+            _, response = self._read_db_for(self.factory.post('/api/v1/comments/upsert/'))
+            pinned_until = response[db_router.PIN_HEADER]
+
+            db, _ = self._read_db_for(self.factory.get('/api/v1/comments/', headers={db_router.PIN_HEADER: pinned_until}))
+            self.assertIsNone(db)
+
+            expired = str(time.time() - 1)
+            db, _ = self._read_db_for(self.factory.get('/api/v1/comments/', headers={db_router.PIN_HEADER: expired}))
+            self.assertEqual(db, 'replica_1')
+
+            db, _ = self._read_db_for(self.factory.get('/api/v1/comments/', headers={db_router.PIN_HEADER: "soon"}))
+            self.assertEqual(db, 'replica_1')
+
+    def test_ui_origin_may_send_and_read_pin_header(self):
+        url = reverse('get_all_comments')
+        response = Client().options(
+            url,
+            headers={
+                "Origin": "http://localhost:5173",
+                "Access-Control-Request-Method": "GET",
+                "Access-Control-Request-Headers": "x-pin-primary-until",
+            }
+        )
+        self.assertIn("x-pin-primary-until", response["Access-Control-Allow-Headers"])
+
+        response = Client().get(url, headers={"Origin": "http://localhost:5173"})
+        self.assertIn(db_router.PIN_HEADER, response["Access-Control-Expose-Headers"])
+
+    def test_unknown_replica_is_unhealthy(self):
+        self.assertFalse(db_router.replica_is_healthy('replica_1'))
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'api'))
+        self.assertIsNone(self.router.allow_migrate('default', 'api'))
+
+
+@skipUnless(HAS_SQLITE_REPLICA, "needs the replica db from api.settings_test")
+@override_settings(DATABASE_REPLICAS=[SQLITE_REPLICA])
+class SqliteReplicaTestCase(TestCase):
+    # the runner sets up every db a test case names, skipped or not
+    databases = {'default', SQLITE_REPLICA} if HAS_SQLITE_REPLICA else {'default'}
+
+    def setUp(self):
+        self.client = Client()
+        db_router._replica_health.clear()
+        self._create_comment('default', "primary")
+        self._create_comment(SQLITE_REPLICA, "replica")
+
+    def _create_comment(self, alias, text):
+        author = Person.objects.using(alias).create(name="Admin")
+        Comment.objects.using(alias).create(
+            author=author, text=text, created_date=timezone.now(), updated_date=timezone.now()
+        )
+
+    def _texts(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [comment['text'] for comment in response.json()['comments']]
+
+    def test_get_is_served_by_replica(self):
+        response = self.client.get(reverse('get_all_comments'))
+
+        self.assertEqual(self._texts(response), ["replica"])
+
+    def test_unavailable_replica_falls_back_to_default(self):
+        replica = connections[SQLITE_REPLICA]
+        with mock.patch.object(replica, 'ensure_connection', side_effect=OperationalError("replica is down")):
+            response = self.client.get(reverse('get_all_comments'))
+
+        self.assertEqual(self._texts(response), ["primary"])
+        self.assertFalse(db_router._replica_health[SQLITE_REPLICA][1])
+
+    def test_client_that_wrote_reads_default(self):
+        self.client.cookies[db_router.PIN_COOKIE] = "1"
+
+        response = self.client.get(reverse('get_all_comments'))
+
+        self.assertEqual(self._texts(response), ["primary"])
@@ -0,0 +1,177 @@
+import io
+import json
+import tempfile
+from unittest import mock
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import import_jobs
+from api.models import Comment, ImportJob
+
+
+def comment_data(comment_id, parent=""):
+    return {
+        "id": comment_id,
+        "parent": parent,
+        "author": "Alice",
+        "text": f"comment {comment_id}",
+        "date": "2023-01-01T10:00:00Z",
+        "likes": 1,
+        "image": ""
+    }
+
+
+class ImportJobTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(IMPORT_JOB_DIR=self.temp_dir.name)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.temp_dir.cleanup()
+
+    def _ndjson(self, *comment_ids):
+        return "\n".join(json.dumps(comment_data(comment_id)) for comment_id in comment_ids)
+
+    def test_upload_and_run(self):
+        response = self.client.post(
+            reverse('create_import_job'),
+            data=self._ndjson("1", "2", "3"),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(job['status'], "queued")
+
+        import_jobs.run_worker(batch_size=2, once=True)
+
+        response = self.client.get(reverse('get_import_job', kwargs={'job_id': job['id']}))
+        job = response.json()
+        self.assertEqual(job['status'], "done")
+        self.assertEqual(job['rows_processed'], 3)
+        self.assertEqual(job['bytes_processed'], job['total_bytes'])
+        self.assertIsNotNone(job['rows_per_second'])
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_chunked_json_upload(self):
+        body = json.dumps({"comments": [comment_data("1"), comment_data("2", parent="1")]})
+
+        response = self.client.post(
+            reverse('create_import_job') + "?format=json&chunked=1",
+            data=body[:30],
+            content_type='application/json'
+        )
+        job_id = response.json()['id']
+        self.assertEqual(response.json()['status'], "uploading")
+
+        response = self.client.post(
+            reverse('upload_import_chunk', kwargs={'job_id': job_id}) + "?last=1",
+            data=body[30:],
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['status'], "queued")
+
+        import_jobs.run_worker(once=True)
+
+        self.assertEqual(ImportJob.objects.get(id=job_id).status, "done")
+        self.assertEqual(Comment.objects.get(external_id="2").parent_comment.external_id, "1")
+
+    def test_reply_before_its_parent_across_batches(self):
+        body = "\n".join(json.dumps(c) for c in [comment_data("2", parent="1"), comment_data("1")])
+        self.client.post(reverse('create_import_job'), data=body, content_type='application/x-ndjson')
+
+        import_jobs.run_worker(batch_size=1, once=True)
+
+        self.assertEqual(Comment.objects.get(external_id="2").parent_comment.external_id, "1")
+
+    def test_chunk_offset_must_match_upload(self):
+        first = self._ndjson("1") + "\n"
+        response = self.client.post(
+            reverse('create_import_job') + "?chunked=1", data=first, content_type='application/x-ndjson'
+        )
+        url = reverse('upload_import_chunk', kwargs={'job_id': response.json()['id']})
+
+        second = self._ndjson("2") + "\n"
+        response = self.client.post(url + f"?offset={len(first)}", data=second, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        total_bytes = response.json()['total_bytes']
+
+        # a retry of the chunk that already landed
+        response = self.client.post(url + f"?offset={len(first)}", data=second, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url + "?offset=abc&last=1", data="", content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url + f"?offset={total_bytes}&last=1", data="", content_type='application/x-ndjson')
+        self.assertEqual(response.json()['status'], "queued")
+        self.assertEqual(response.json()['total_bytes'], total_bytes)
+
+    def test_chunk_after_upload_finished(self):
+        response = self.client.post(reverse('create_import_job'), data=self._ndjson("1"), content_type='application/x-ndjson')
+
+        response = self.client.post(
+            reverse('upload_import_chunk', kwargs={'job_id': response.json()['id']}),
+            data=self._ndjson("2"),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_does_not_create_jobs(self):
+        response = self.client.get(reverse('create_import_job'))
+
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_bad_format(self):
+        response = self.client.post(reverse('create_import_job') + "?format=csv", data="a,b", content_type='text/csv')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_resume_stale_job(self):
+        response = self.client.post(reverse('create_import_job'), data=self._ndjson("1"), content_type='application/x-ndjson')
+        job = ImportJob.objects.get(id=response.json()['id'])
+        import_jobs.run_worker(once=True)
+
+        # pretend the worker died after the first batch, with more of the file left to read
+        with open(job.ingest_path(), "a") as f:
+            f.write(self._ndjson("2", "3") + "\n")
+        ImportJob.objects.filter(id=job.id).update(
+            status=ImportJob.RUNNING,
+            updated_date=timezone.now() - import_jobs.STALE_AFTER * 2
+        )
+
+        import_jobs.run_worker(once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.rows_processed, 3)
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_json_conversion_streams_entries(self):
+        comments = [comment_data(str(n)) for n in range(20)]
+        comments[3]["text"] = 'has "quotes", commas and ] brackets'
+        upload = io.StringIO(json.dumps({"comments": comments}, indent=2))
+
+        streamed = list(import_jobs._stream_json_comments(upload, chunk_size=16))
+
+        self.assertEqual(streamed, comments)
+
+    def test_json_conversion_of_truncated_file_fails(self):
+        upload = io.StringIO(json.dumps({"comments": [comment_data("1"), comment_data("2")]})[:-20])
+
+        with self.assertRaises(json.JSONDecodeError):
+            list(import_jobs._stream_json_comments(upload, chunk_size=16))
+
+    def test_heartbeat_keeps_running_job_fresh(self):
+        job = ImportJob.objects.create(status=ImportJob.RUNNING)
+        ImportJob.objects.filter(id=job.id).update(updated_date=timezone.now() - import_jobs.STALE_AFTER * 2)
+        stopped = mock.Mock()
+        stopped.wait.side_effect = [False, True]
+
+        with mock.patch.object(import_jobs.connections, "close_all"):
+            import_jobs._heartbeat(job.id, stopped)
+
+        self.assertIsNone(import_jobs.claim_next_job())
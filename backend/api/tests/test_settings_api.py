@@ -0,0 +1,54 @@
+import json
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import settings_api
+from api.models import Comment, Person
+
+
+@override_settings(MIDDLEWARE=settings_api.MIDDLEWARE, TEMPLATES=settings_api.TEMPLATES, USE_I18N=False)
+class ApiSettingsProfileTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.test_person = Person.objects.create(name="Admin")
+        self.comment = Comment.objects.create(
+            author=self.test_person,
+            text="text",
+            created_date=timezone.now(),
+            updated_date=timezone.now()
+        )
+
+    def test_profile_drops_unused_apps_and_middleware(self):
+        for app in ['django.contrib.admin', 'django.contrib.auth', 'django.contrib.sessions',
+                    'django.contrib.messages', 'django.contrib.staticfiles']:
+            self.assertNotIn(app, settings_api.INSTALLED_APPS)
+        self.assertFalse([m for m in settings_api.MIDDLEWARE if 'contrib' in m])
+        self.assertIn('corsheaders.middleware.CorsMiddleware', settings_api.MIDDLEWARE)
+        self.assertIn('api.db_router.ReplicaPinningMiddleware', settings_api.MIDDLEWARE)
+
+    def test_endpoints_work_without_session_or_auth_middleware(self):
+        response = self.client.post(
+            reverse('upsert_comment'),
+            data=json.dumps({"text": "reply", "parent_comment_id": self.comment.id}),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        reply_id = response.json()["id"]
+
+        response = self.client.get(reverse('get_all_comments'))
+        self.assertEqual(len(response.json()["comments"]), 2)
+
+        response = self.client.post(reverse('like_comment', args=[reply_id]))
+        self.assertEqual(response.json()["likes"], 1)
+
+        response = self.client.get(reverse('get_comment_thread', args=[self.comment.id]))
+        self.assertEqual(response.json()["thread"]["replies"][0]["id"], reply_id)
+
+        response = self.client.post(reverse('delete_comment', args=[reply_id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cors_headers_still_sent(self):
+        response = self.client.get(reverse('get_all_comments'), HTTP_ORIGIN="http://localhost:5173")
+
+        self.assertEqual(response["Access-Control-Allow-Origin"], "http://localhost:5173")
@@ -0,0 +1,161 @@
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from api import thread_index
+from api.models import Comment, Person
+
+
+class ThreadIndexTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.test_person = Person.objects.create(name="Admin")
+        self.root = self._create()
+        self.reply = self._create(self.root)
+        self.second_reply = self._create(self.root)
+        self.nested_reply = self._create(self.reply)
+
+        self.index = thread_index.ThreadIndex(max_comments=100)
+        self.assertTrue(self.index.load())
+
+    def _create(self, parent=None):
+        return Comment.objects.create(
+            parent_comment=parent,
+            author=self.test_person,
+            text="text",
+            created_date=timezone.now(),
+            updated_date=timezone.now()
+        )
+
+    def _notify(self, comment_id, parent_id=None, deleted=False):
+        self.index.apply(f"{comment_id},{parent_id or ''},{int(deleted)}")
+
+    def test_load_builds_thread(self):
+        self.assertEqual(self.index.thread(self.root.id), {
+            "id": self.root.id, "reply_count": 2, "replies": [
+                {"id": self.reply.id, "reply_count": 1, "replies": [
+                    {"id": self.nested_reply.id, "reply_count": 0, "replies": []},
+                ]},
+                {"id": self.second_reply.id, "reply_count": 0, "replies": []},
+            ]
+        })
+        self.assertEqual(self.index.reply_count(self.reply.id), 1)
+
+    def test_max_depth_keeps_reply_counts(self):
+        thread = self.index.thread(self.root.id, max_depth=1)
+
+        self.assertEqual([r["id"] for r in thread["replies"]], [self.reply.id, self.second_reply.id])
+        self.assertEqual(thread["replies"][0]["reply_count"], 1)
+        self.assertEqual(thread["replies"][0]["replies"], [])
+
+    def test_load_skips_replies_of_deleted_comments(self):
+        Comment.objects.filter(pk=self.reply.pk).update(deleted_date=timezone.now())
+        self.index.load()
+
+        self.assertEqual(self.index.reply_count(self.root.id), 1)
+        self.assertIsNone(self.index.thread(self.reply.id))
+        self.assertIsNone(self.index.thread(self.nested_reply.id))
+
+    def test_notifications_add_move_and_remove(self):
+        new_id = self.nested_reply.id + 1
+        self._notify(new_id, self.second_reply.id)
+        self.assertEqual(self.index.reply_count(self.second_reply.id), 1)
+
+        self._notify(new_id, self.root.id)
+        self.assertEqual(self.index.reply_count(self.second_reply.id), 0)
+        self.assertEqual(self.index.reply_count(self.root.id), 3)
+
+        self._notify(self.reply.id, self.root.id, deleted=True)
+        self.assertEqual(self.index.reply_count(self.root.id), 2)
+        self.assertIsNone(self.index.reply_count(self.reply.id))
+        self.assertFalse(self.index.needs_resync)
+
+    def test_replies_of_deleted_comment_leave_the_index(self):
+        self._notify(self.root.id, deleted=True)
+
+        self.assertIsNone(self.index.thread(self.reply.id))
+        self.assertIsNone(self.index.reply_count(self.nested_reply.id))
+
+    def test_replayed_notification_is_idempotent(self):
+        self._notify(self.reply.id, self.root.id)
+
+        self.assertEqual(self.index.reply_count(self.root.id), 2)
+
+    def test_out_of_order_commits_dont_resync(self):
+        # the later id commits first
+        newest_id = self.nested_reply.id
+        self._notify(newest_id + 2, self.root.id)
+        self._notify(newest_id + 1, self.second_reply.id)
+        self._notify(newest_id + 3, newest_id + 1)
+
+        self.assertFalse(self.index.needs_resync)
+        self.assertEqual(self.index.reply_count(self.root.id), 3)
+        self.assertEqual(self.index.reply_count(newest_id + 1), 1)
+        self.assertEqual(
+            [r["id"] for r in self.index.thread(self.second_reply.id)["replies"]],
+            [newest_id + 1]
+        )
+
+    def test_late_id_below_the_loaded_ones_is_added(self):
+        # committed after the load read past it
+        Comment.all_objects.filter(pk=self.second_reply.pk).delete()
+        self.index.load()
+        self._notify(self.second_reply.id, self.root.id)
+
+        self.assertFalse(self.index.needs_resync)
+        self.assertEqual(self.index.reply_count(self.root.id), 2)
+        self.assertEqual(self.index.reply_count(self.second_reply.id), 0)
+
+    def test_reply_to_unknown_newer_parent_asks_for_resync(self):
+        self._notify(self.nested_reply.id + 2, self.nested_reply.id + 1)
+
+        self.assertTrue(self.index.needs_resync)
+
+    def test_resync_notification(self):
+        self.index.apply(thread_index.RESYNC_PAYLOAD)
+
+        self.assertTrue(self.index.needs_resync)
+
+    def test_full_index_asks_for_resync_and_load_switches_off(self):
+        self.index.max_comments = 4
+        self._notify(self.nested_reply.id + 1, self.root.id)
+        self.assertTrue(self.index.needs_resync)
+
+        self._create(self.root)
+        self.assertFalse(self.index.load())
+        self.assertFalse(self.index.ready)
+        # switched off until the periodic resync, notifications don't keep asking for reloads
+        self.assertFalse(self.index.needs_resync)
+        self._notify(self.nested_reply.id + 2, self.root.id)
+        self.assertFalse(self.index.needs_resync)
+
+    def test_thread_view_answers_from_index_without_queries(self):
+        with mock.patch.object(thread_index, "_index", self.index):
+            self.index.ready = True
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('get_comment_thread', args=[self.root.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["thread"], self.index.thread(self.root.id))
+
+    def test_thread_view_falls_back_to_db(self):
+        Comment.objects.filter(pk=self.root.pk).update(reply_count=2)
+        Comment.objects.filter(pk=self.reply.pk).update(reply_count=1)
+
+        response = self.client.get(reverse('get_comment_thread', args=[self.root.id]), {"depth": 1})
+
+        self.assertEqual(response.status_code, 200)
+        thread = response.json()["thread"]
+        self.assertEqual(thread["reply_count"], 2)
+        self.assertEqual([r["id"] for r in thread["replies"]], [self.reply.id, self.second_reply.id])
+        self.assertEqual(thread["replies"][0]["reply_count"], 1)
+        self.assertEqual(thread["replies"][0]["replies"], [])
+
+    def test_thread_view_404s_for_deleted_comment(self):
+        Comment.objects.filter(pk=self.root.pk).update(deleted_date=timezone.now())
+
+        response = self.client.get(reverse('get_comment_thread', args=[self.root.id]))
+
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,308 @@
+"""
+Per worker in-memory index of the comment tree (postgres only, opt in with THREAD_INDEX_ENABLED).
+
+Every visible comment gets a slot in five flat arrays of 8 byte ints, id, parent slot, first child,
+next sibling and reply count, 40 bytes a comment, so thread shape and reply counts are answered
+without a query.  A resync builds the new arrays (and the parent ids it reads) while the old ones
+still serve, so it peaks at about 90 bytes a comment.  A load fills the slots in id order, lookups among them are a bisect.  Comments
+notified after that are appended and found through a small id -> slot map instead, sequence ids
+are handed out in allocation order but their notifications arrive in commit order, so they can
+come in out of order.  Deleted comments are left behind as tombstones, the next resync compacts
+them away and folds the map back into the sorted slots.
+
+A trigger on api_comment sends `id,parent_comment_id,deleted` on the comment_tree channel for
+every insert, delete and change of parent or deleted_date, so the index sees imports, the purge
+and raw SQL as well as the views.  A listener thread per worker applies them.  Postgres doesn't
+drop notifications while the LISTEN connection is up, so the index reloads whenever that
+connection is (re)opened, when a notification can't be applied (a reply to a parent newer than
+the last load that was never notified means something was missed), when it grows past THREAD_INDEX_MAX_COMMENTS slots and every
+THREAD_INDEX_RESYNC_SECONDS regardless.  Whenever it isn't loaded get_index() returns None and
+callers read the database instead.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connections
+
+from api.models import Comment
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "comment_tree"
+# sent by changes the trigger can't see, eg archive_partitions dropping a whole month
+RESYNC_PAYLOAD = "resync"
+
+# the trigger itself is created by migration 0010, convert_to_partitioned puts it back on the new table
+NOTIFY_TRIGGER_SQL = f"""
+    CREATE TRIGGER comment_tree_notify
+    AFTER INSERT OR DELETE OR UPDATE OF parent_comment_id, deleted_date ON {Comment._meta.db_table}
+    FOR EACH ROW EXECUTE FUNCTION comment_tree_notify()
+"""
+
+# parent slot values that aren't slots
+NO_PARENT = -1
+REMOVED = -2
+# first child / next sibling end of list
+NONE = -1
+
+# the index loaded by start(), None until then
+_index = None
+
+
+def get_index():
+    """The worker's index while it's loaded and current, otherwise None"""
+    if _index is not None and _index.ready:
+        return _index
+    return None
+
+
+def start():
+    """Loads the index and starts following notifications in the background, called once per worker"""
+    global _index
+    if not settings.THREAD_INDEX_ENABLED or _index is not None:
+        return
+    if connections['default'].vendor != 'postgresql':
+        logger.warning("The thread index needs postgres notifications, it stays off")
+        return
+    _index = ThreadIndex(settings.THREAD_INDEX_MAX_COMMENTS)
+    threading.Thread(target=_index.listen, name="thread-index", daemon=True).start()
+
+
+class _Tree:
+    """The arrays for one load, swapped in whole on a resync"""
+
+    def __init__(self, ids: array):
+        slot_count = len(ids)
+        # ids[:sorted_count] came from the load in id order, later slots are looked up in appended
+        self.ids = ids
+        self.sorted_count = slot_count
+        self.appended = {}
+        self.parents = array('q', [REMOVED]) * slot_count
+        self.first_child = array('q', [NONE]) * slot_count
+        self.next_sibling = array('q', [NONE]) * slot_count
+        self.reply_counts = array('l', [0]) * slot_count
+
+    def find(self, comment_id):
+        slot = bisect_left(self.ids, comment_id, 0, self.sorted_count)
+        if slot < self.sorted_count and self.ids[slot] == comment_id:
+            return slot
+        return self.appended.get(comment_id)
+
+    def loaded_max_id(self):
+        return self.ids[self.sorted_count - 1] if self.sorted_count else 0
+
+    def append(self, comment_id) -> int:
+        self.ids.append(comment_id)
+        self.parents.append(REMOVED)
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.reply_counts.append(0)
+        self.appended[comment_id] = len(self.ids) - 1
+        return len(self.ids) - 1
+
+    def attach(self, slot, parent_slot):
+        if parent_slot == NO_PARENT:
+            self.parents[slot] = NO_PARENT
+            return
+        self.parents[slot] = parent_slot
+        self.next_sibling[slot] = self.first_child[parent_slot]
+        self.first_child[parent_slot] = slot
+        self.reply_counts[parent_slot] += 1
+
+    def detach(self, slot):
+        parent_slot = self.parents[slot]
+        self.parents[slot] = REMOVED
+        if parent_slot < 0:
+            return
+        previous, child = NONE, self.first_child[parent_slot]
+        while child != NONE and child != slot:
+            previous, child = child, self.next_sibling[child]
+        if child == NONE:
+            return
+        if previous == NONE:
+            self.first_child[parent_slot] = self.next_sibling[slot]
+        else:
+            self.next_sibling[previous] = self.next_sibling[slot]
+        self.next_sibling[slot] = NONE
+        self.reply_counts[parent_slot] -= 1
+
+    def visible(self, slot) -> bool:
+        # deleting a comment only detaches that slot, its replies still point at it
+        while slot >= 0:
+            slot = self.parents[slot]
+            if slot == REMOVED:
+                return False
+        return True
+
+    def children(self, slot) -> list:
+        child_slots = []
+        child = self.first_child[slot]
+        while child != NONE:
+            child_slots.append(child)
+            child = self.next_sibling[child]
+        return sorted(child_slots, key=self.ids.__getitem__)
+
+
+class ThreadIndex:
+    def __init__(self, max_comments):
+        self.max_comments = max_comments
+        self.ready = False
+        self._tree = _Tree(array('q'))
+        self._lock = threading.Lock()
+        self._needs_resync = False
+        self._stopped = threading.Event()
+
+    def load(self) -> bool:
+        """Rebuilds the index from the database, False if there are more comments than it may hold"""
+        ids = array('q')
+        parent_ids = array('q')
+        rows = Comment.objects.order_by('id').values_list('id', 'parent_comment_id').iterator(chunk_size=20000)
+        for comment_id, parent_id in rows:
+            if len(ids) >= self.max_comments:
+                logger.warning(f"More than {self.max_comments} comments, the thread index is off until they fit")
+                # try again at the next THREAD_INDEX_RESYNC_SECONDS tick, not on every notification
+                with self._lock:
+                    self.ready = False
+                    self._needs_resync = False
+                return False
+            ids.append(comment_id)
+            # ids start at 1, 0 stands for no parent
+            parent_ids.append(parent_id or 0)
+
+        tree = _Tree(ids)
+        for slot, parent_id in enumerate(parent_ids):
+            if not parent_id:
+                tree.attach(slot, NO_PARENT)
+                continue
+            parent_slot = tree.find(parent_id)
+            # a reply under a deleted comment isn't part of any visible thread
+            if parent_slot is not None:
+                tree.attach(slot, parent_slot)
+
+        with self._lock:
+            self._tree = tree
+            self._needs_resync = False
+            self.ready = True
+        logger.info(f"Loaded the thread index, {len(ids)} comments")
+        return True
+
+    def apply(self, payload: str):
+        """Applies one `id,parent_comment_id,deleted` notification"""
+        if payload == RESYNC_PAYLOAD:
+            self._needs_resync = True
+            return
+        comment_id, parent_id, deleted = payload.split(",")
+        comment_id = int(comment_id)
+        parent_id = int(parent_id) if parent_id else None
+
+        with self._lock:
+            if not self.ready:
+                # nothing to keep current, the next load starts from the db anyway
+                return
+            tree = self._tree
+            slot = tree.find(comment_id)
+
+            if deleted == "1":
+                if slot is not None:
+                    tree.detach(slot)
+                return
+
+            if parent_id is None:
+                parent_slot = NO_PARENT
+            else:
+                parent_slot = tree.find(parent_id)
+                if parent_slot is None and parent_id > tree.loaded_max_id():
+                    # a parent newer than the load that we never heard about, it committed before its reply did
+                    self._needs_resync = True
+                    return
+
+            if slot is None:
+                if len(tree.ids) >= self.max_comments:
+                    # no room left, compact from the db
+                    self._needs_resync = True
+                    return
+                slot = tree.append(comment_id)
+            else:
+                tree.detach(slot)
+
+            # a reply under a deleted comment isn't part of any visible thread
+            if parent_slot is None or (parent_slot != NO_PARENT and tree.parents[parent_slot] == REMOVED):
+                return
+            tree.attach(slot, parent_slot)
+
+    @property
+    def needs_resync(self) -> bool:
+        return self._needs_resync
+
+    def reply_count(self, comment_id):
+        """Number of visible replies, None if the comment isn't in the index"""
+        with self._lock:
+            slot = self._tree.find(comment_id)
+            if slot is None or not self._tree.visible(slot):
+                return None
+            return self._tree.reply_counts[slot]
+
+    def thread(self, comment_id, max_depth=None):
+        """
+        The reply tree under comment_id as nested {"id", "reply_count", "replies"} dicts, oldest reply
+        first, None if the comment isn't in the index.  Replies below max_depth are left out, their
+        reply_count still says how many there are.
+        """
+        with self._lock:
+            tree = self._tree
+            slot = tree.find(comment_id)
+            if slot is None or not tree.visible(slot):
+                return None
+
+            root = {"id": comment_id, "reply_count": tree.reply_counts[slot], "replies": []}
+            pending = [(slot, root, 0)]
+            while pending:
+                slot, node, depth = pending.pop()
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for child in tree.children(slot):
+                    child_node = {"id": tree.ids[child], "reply_count": tree.reply_counts[child], "replies": []}
+                    node["replies"].append(child_node)
+                    pending.append((child, child_node, depth + 1))
+            return root
+
+    def listen(self):
+        """Keeps the index current until stop(), runs on its own thread"""
+        while not self._stopped.is_set():
+            try:
+                with self._connect() as listen_connection:
+                    # listen before loading, whatever commits during the load is replayed on top of it
+                    listen_connection.execute(f"LISTEN {CHANNEL}")
+                    loaded_at = self._resync()
+                    while not self._stopped.is_set():
+                        for notify in listen_connection.notifies(timeout=1.0):
+                            self.apply(notify.payload)
+                        if self._needs_resync or time.monotonic() - loaded_at > settings.THREAD_INDEX_RESYNC_SECONDS:
+                            loaded_at = self._resync()
+            except Exception as e:
+                # notifications sent while we're disconnected are gone, don't answer from a stale index
+                self.ready = False
+                logger.warning(f"Thread index lost its notification connection, reloading once it's back: {e}")
+                self._stopped.wait(5)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _resync(self) -> float:
+        try:
+            self.load()
+        finally:
+            # load() ran on this thread's own django connection, don't keep it checked out
+            connections.close_all()
+        return time.monotonic()
+
+    def _connect(self):
+        # a dedicated connection outside the pool, LISTEN holds on to it for the life of the worker
+        import psycopg
+
+        params = connections['default'].get_connection_params()
+        return psycopg.connect(**params, autocommit=True)
@@ -1,10 +1,17 @@
-from django.contrib import admin
 from django.urls import path
 
 from api import views
 
 urlpatterns = [
     path('api/v1/comments/', views.get_all_comments, name='get_all_comments'),
+    path('api/v1/comments/<int:comment_id>/', views.get_comment, name='get_comment'),
+    path('api/v1/comments/<int:comment_id>/thread/', views.get_comment_thread, name='get_comment_thread'),
     path('api/v1/comments/upsert/', views.upsert_comment, name='upsert_comment'),
-    path('api/v1/comments/<str:comment_id>/delete/', views.delete_comment, name='delete_comment'),
+    path('api/v1/comments/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
+    path('api/v1/comments/<int:comment_id>/like/', views.like_comment, name='like_comment'),
+    path('api/v1/authors/<uuid:author_id>/comments/', views.get_author_comments, name='get_author_comments'),
+    path('api/v1/imports/', views.create_import_job, name='create_import_job'),
+    path('api/v1/imports/<uuid:job_id>/', views.get_import_job, name='get_import_job'),
+    path('api/v1/imports/<uuid:job_id>/chunks/', views.upload_import_chunk, name='upload_import_chunk'),
+    path('api/v1/metrics/db/', views.get_db_stats, name='get_db_stats'),
 ]
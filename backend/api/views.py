@@ -1,34 +1,139 @@
 import json
 import logging
-import uuid
 
-from django.http import JsonResponse, HttpRequest
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.http import JsonResponse, HttpRequest, Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-from api.models import Comment, Person
+from api import comment_manager, import_jobs, instrumentation, thread_index
+from api.models import AuthorStats, Comment, ImportJob, Person
 
 logger = logging.getLogger(__name__)
 
+SORT_ORDERS = {
+    "new": ("-created_date",),
+    # scores can tie, eg two comments past the horizon with the same likes
+    "top": ("-hot_score", "-created_date"),
+}
+
 
 def fetch_current_user() -> Person:
     # TODO- replace this with real auth
     return Person.objects.get(name="Admin")
 
 
+def parse_date_param(value):
+    """An iso datetime from the query string, None when it isn't one (parse_datetime raises on eg month 13)"""
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return None
+
+
+def get_comment_or_404(comment_id) -> Comment:
+    try:
+        comment = Comment.objects.get(pk=int(comment_id))
+    except (ValueError, Comment.DoesNotExist):
+        raise Http404(f"Comment {comment_id} not found")
+    
+    # a reply in a deleted thread is gone as far as the api goes, even before the purge marks it
+    if comment.parent_comment_id and comment_manager.hidden_by_deleted_ancestor([comment.pk]):
+        raise Http404(f"Comment {comment_id} not found")
+    return comment
+
+
 @csrf_exempt
 def get_all_comments(request: HttpRequest) -> JsonResponse:
-    comments = Comment.objects.select_related('author').order_by("-created_date")
+    sort = request.GET.get("sort", "new")
+    if sort not in SORT_ORDERS:
+        return JsonResponse({"error": f"sort must be one of {', '.join(SORT_ORDERS)}"}, status=400)
+    
+    fields = set(Comment.DICT_FIELDS)
+    if request.GET.get("fields"):
+        fields = set(request.GET["fields"].split(","))
+        unknown = fields - set(Comment.DICT_FIELDS) - {"id", "parent_comment_id"}
+        if unknown:
+            return JsonResponse({"error": f"unknown fields {', '.join(sorted(unknown))}"}, status=400)
+    
+    preview = request.GET.get("preview")
+    if preview is not None:
+        if not preview.isdigit() or int(preview) == 0:
+            return JsonResponse({"error": "preview must be a positive number"}, status=400)
+        preview = int(preview)
+    
+    # created_date bounds the ancestor lookups even when it isn't returned
+    columns = ["id", "parent_comment_id", "created_date"]
+    for field in fields:
+        if field == "text" and preview:
+            continue
+        columns.extend(Comment.DICT_FIELDS.get(field, []))
+    
+    comments = Comment.objects.only(*columns).order_by(*SORT_ORDERS[sort])
+    if "author" in fields:
+        comments = comments.select_related('author')
+    if preview and "text" in fields:
+        # one char past the preview tells us whether it was cut without reading the whole text
+        comments = comments.annotate(text_preview=Substr("text", 1, preview + 1))
+    unfiltered_comments = comments
+    
+    # bounding created_date lets postgres skip the older monthly partitions entirely
+    since = request.GET.get("since")
+    if since:
+        since_date = parse_date_param(since)
+        if not since_date:
+            return JsonResponse({"error": "since must be an iso datetime"}, status=400)
+        comments = comments.filter(created_date__gte=since_date)
+    
+    # a new reply in an old thread brings its ancestors along, only deleted ones get it pruned
+    comments = comment_manager.add_missing_ancestors(list(comments), unfiltered_comments)
     
     return JsonResponse({
         "comments": [
-            comment.to_dict()
-            for comment in comments
+            _comment_list_dict(comment, fields, preview)
+            for comment in comment_manager.prune_orphans(comments)
         ]
     })
 
 
+def _comment_list_dict(comment: Comment, fields: set, preview) -> dict:
+    if not preview or "text" not in fields:
+        return comment.to_dict(fields)
+    
+    d = comment.to_dict(fields - {"text"})
+    d["text"] = comment.text_preview[:preview]
+    d["text_truncated"] = len(comment.text_preview) > preview
+    return d
+
+
+@csrf_exempt
+def get_comment(request: HttpRequest, comment_id: int) -> JsonResponse:
+    comment = get_comment_or_404(comment_id)
+    
+    return JsonResponse(comment.to_dict())
+
+
+@csrf_exempt
+def get_comment_thread(request: HttpRequest, comment_id: int) -> JsonResponse:
+    depth = request.GET.get("depth")
+    if depth is not None:
+        if not depth.isdigit():
+            return JsonResponse({"error": "depth must be a number"}, status=400)
+        depth = int(depth)
+    
+    # answered from the worker's thread index when it's on, a comment it hasn't heard about yet falls through
+    index = thread_index.get_index()
+    thread = index.thread(comment_id, depth) if index else None
+    if thread is None:
+        thread = comment_manager.comment_thread(get_comment_or_404(comment_id), depth)
+    
+    return JsonResponse({"thread": thread})
+
+
 @csrf_exempt
 def upsert_comment(request: HttpRequest) -> JsonResponse:
     body = json.loads(request.body)
@@ -41,29 +146,164 @@ def upsert_comment(request: HttpRequest) -> JsonResponse:
     
     comment_id = body.get("comment_id")
     if comment_id:
-        comment = get_object_or_404(Comment, pk=comment_id)
+        comment = get_comment_or_404(comment_id)
         comment.text = text
         updated_date = timezone.now(),
         comment.image = body.get("image", "")
         comment.save()
+        comment_manager.refresh_hot_scores([comment.pk])
     else:
+        parent_comment_id = body.get("parent_comment_id")
+        parent = get_comment_or_404(parent_comment_id) if parent_comment_id else None
+        
         comment = Comment.objects.create(
-            id=uuid.uuid4(),
+            parent_comment=parent,
             created_date=timezone.now(),
             updated_date=timezone.now(),
             author=author,
             text=text,
             image=body.get("image", "")
         )
+        if parent:
+            comment_manager.add_reply(parent, comment)
+        else:
+            comment_manager.refresh_hot_scores([comment.pk])
+        comment_manager.record_author_activity(author.id, comments=1, activity_date=comment.created_date)
+        comment.refresh_from_db()
     
     return JsonResponse(comment.to_dict())
 
 
 @csrf_exempt
-def delete_comment(request: HttpRequest, comment_id: str) -> JsonResponse:
-    comment = get_object_or_404(Comment, pk=comment_id)
-    comment.delete()
+def delete_comment(request: HttpRequest, comment_id: int) -> JsonResponse:
+    comment = get_comment_or_404(comment_id)
+    
+    # soft delete only, the replies are removed in batches by the purge_comments command
+    Comment.objects.filter(pk=comment.pk).update(deleted_date=timezone.now())
+    if comment.parent_comment_id:
+        comment_manager.remove_reply(comment.parent_comment_id)
+    comment_manager.remove_from_author_stats([(comment.author_id, comment.likes)])
     
     return JsonResponse({
         "message": f"Comment {comment_id} deleted successfully"
     }, status=200)
+
+
+@csrf_exempt
+@require_POST
+def like_comment(request: HttpRequest, comment_id: int) -> JsonResponse:
+    comment = comment_manager.like_comment(get_comment_or_404(comment_id))
+    
+    return JsonResponse(comment.to_dict())
+
+
+@csrf_exempt
+def get_author_comments(request: HttpRequest, author_id) -> JsonResponse:
+    author = get_object_or_404(Person, pk=author_id)
+    # a read, an author without a stats row yet just has nothing counted
+    stats = AuthorStats.objects.filter(person=author).first() or AuthorStats(person=author)
+    
+    try:
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 200)
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+    
+    # keyset paging on (author, created_date, id) so every page is a short index range scan, id
+    # keeps comments that share a created_date from falling between pages
+    comments = (
+        Comment.objects.filter(author=author)
+        .select_related('author')
+        .order_by("-created_date", "-id")
+    )
+    before = request.GET.get("before")
+    if before:
+        before_date = parse_date_param(before)
+        if not before_date:
+            return JsonResponse({"error": "before must be an iso datetime"}, status=400)
+        before_id = request.GET.get("before_id")
+        if before_id is None:
+            comments = comments.filter(created_date__lt=before_date)
+        elif not before_id.isdigit():
+            return JsonResponse({"error": "before_id must be a comment id"}, status=400)
+        else:
+            comments = _before(comments, before_date, int(before_id))
+    
+    # replies in deleted threads are skipped, so keep reading until the page is full
+    page = []
+    while len(page) < limit:
+        batch = list(comments[:limit])
+        hidden = comment_manager.hidden_by_deleted_ancestor([c.id for c in batch if c.parent_comment_id])
+        page.extend(comment for comment in batch if comment.id not in hidden)
+        if len(batch) < limit:
+            break
+        comments = _before(comments, batch[-1].created_date, batch[-1].id)
+    page = page[:limit]
+    return JsonResponse({
+        "author": {
+            "id": str(author.id),
+            "name": author.name,
+            **stats.to_dict()
+        },
+        "comments": [
+            comment.to_dict()
+            for comment in page
+        ],
+        # pass these back as before and before_id for the next page
+        "next": {
+            "before": page[-1].created_date.isoformat(),
+            "before_id": page[-1].id
+        } if len(page) == limit else None
+    })
+
+
+def _before(comments, created_date, comment_id):
+    return comments.filter(Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=comment_id))
+
+
+@csrf_exempt
+@require_POST
+def create_import_job(request: HttpRequest) -> JsonResponse:
+    # the body is streamed to disk rather than read into memory, so it can be as big as a chunk needs
+    try:
+        job = import_jobs.create_job(
+            request,
+            request.GET.get("format", "ndjson"),
+            chunked=request.GET.get("chunked") == "1"
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    return JsonResponse(job.to_dict())
+
+
+@csrf_exempt
+@require_POST
+def upload_import_chunk(request: HttpRequest, job_id) -> JsonResponse:
+    job = get_object_or_404(ImportJob, pk=job_id)
+    
+    offset = request.GET.get("offset")
+    if offset is not None and not offset.isdigit():
+        return JsonResponse({"error": "offset must be a number"}, status=400)
+    
+    try:
+        import_jobs.append_chunk(
+            job, request, last=request.GET.get("last") == "1", offset=int(offset) if offset else None
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    return JsonResponse(job.to_dict())
+
+
+@csrf_exempt
+def get_import_job(request: HttpRequest, job_id) -> JsonResponse:
+    job = get_object_or_404(ImportJob, pk=job_id)
+    
+    return JsonResponse(job.to_dict())
+
+
+@csrf_exempt
+def get_db_stats(request: HttpRequest) -> JsonResponse:
+    return JsonResponse({
+        "databases": instrumentation.db_pool_stats()
+    })
@@ -2,4 +2,4 @@
 set -euo pipefail
 source .env
 
-(cd "$BACKEND_DIR" && source .venv/bin/activate && python manage.py test)
\ No newline at end of file
+(cd "$BACKEND_DIR" && source .venv/bin/activate && python manage.py test --settings=api.settings_test)
\ No newline at end of file
@@ -1,10 +1,24 @@
 const API_BASE_URL = import.meta.env.VITE_API_BASE
 
+// after a write the api pins our reads to the primary db until this deadline, the cookie it also
+// sets isn't kept by the browser since the api is on another site
+const PIN_HEADER = 'X-Pin-Primary-Until';
+let pinPrimaryUntil = null;
+
+function pinHeaders() {
+    return pinPrimaryUntil ? {[PIN_HEADER]: pinPrimaryUntil} : {};
+}
+
+function rememberPin(response) {
+    pinPrimaryUntil = response.headers.get(PIN_HEADER) || pinPrimaryUntil;
+}
 
 async function doGet(url) {
     const response = await fetch(`${API_BASE_URL}${url}`, {
+        headers: pinHeaders(),
         credentials: 'include'
     });
+    rememberPin(response);
     
     const resp_data = await response.json();
     
@@ -20,10 +34,12 @@ async function doPost(url, data = {}) {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            ...pinHeaders(),
         },
         credentials: 'include',
         body: JSON.stringify(data)
     });
+    rememberPin(response);
 
     const resp_data = await response.json();
     